@@ -1,12 +1,15 @@
 
 
+import sys
 import click
 import logging
 from flask_client.config import Config
-from flask_client.services import get_json_data, send_post_data
+from flask_client.services import ResponseCache, fetch_data, send_ndjson_data, send_post_data
 from flask_client.parser import DataParser
-from flask_client.models import Base, ItemModel, IndicatorModel
-from sqlalchemy import create_engine
+from flask_client.ingest import IngestStats, dedup_items, parse_parallel
+from flask_client.export import EXPORT_FORMATS, iter_feed_items, write_json, write_ndjson, write_parquet
+from flask_client.models import Base, ItemModel, IndicatorModel, add_missing_columns
+from sqlalchemy import create_engine, update
 from sqlalchemy.orm import sessionmaker
 
 # Setup logger
@@ -15,21 +18,48 @@ logging.basicConfig(level=logging.INFO)
 
 # Database setup
 engine = create_engine(Config.DATABASE_URL)
-Base.metadata.drop_all(engine)  # Drops all tables
 Base.metadata.create_all(engine)
+add_missing_columns(engine)  # Databases created before the fingerprint columns existed
 Session = sessionmaker(bind=engine)
 
+# Number of ids looked up per query, kept well below SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
 
-def save_to_database(data_parser: DataParser, session):
-    """Saves parsed data from DataParser into the database."""
-    for item in data_parser.items:
+# Number of schema errors printed after a fetch, the rest are only counted
+MAX_LOGGED_ERRORS = 20
+
+
+def load_stored_rows(session, model, ids, *columns):
+    """Returns {id: row} with only the given columns for the stored rows, without loading ORM objects."""
+    rows = {}
+    ids = list(ids)
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        chunk = ids[start:start + LOOKUP_CHUNK_SIZE]
+        for row in session.query(model.id, *columns).filter(model.id.in_(chunk)):
+            rows[row.id] = row
+    return rows
+
+
+def save_to_database(data_parser: DataParser, session) -> IngestStats:
+    """Saves parsed data from DataParser into the database and returns the ingest stats."""
+    stats = IngestStats()
+    items = dedup_items(data_parser.items, stats)
+
+    # Fetch the stored seqUpdate and fingerprints up front, so unchanged rows are never loaded
+    stored_items = load_stored_rows(session, ItemModel, (item.id for item in items),
+                                    ItemModel.seq_update, ItemModel.fingerprint)
+    stored_indicators = load_stored_rows(session, IndicatorModel,
+                                         (ind.id for item in items for ind in item.indicators or []),
+                                         IndicatorModel.fingerprint)
+
+    seq_updates = []
+    for item in items:
         # Debugging: Log the parsed data
         logger.debug(f"Parsed item: {item.__dict__}")
 
-        # Check if the item already exists in the database
-        item_model = session.query(ItemModel).filter_by(id=item.id).first()
+        stored_item = stored_items.get(item.id)
 
-        if item_model is None:
+        if stored_item is None:
             # Debugging: Indicate that a new item is being added
             logger.debug(f"Adding new item: {item.id}")
             item_model = ItemModel(
@@ -43,11 +73,24 @@ def save_to_database(data_parser: DataParser, session):
                 langs=item.langs if item.langs is not None else [],
                 seq_update=item.seq_update if item.seq_update is not None else 0,
                 malware_list=item.malware_list if item.malware_list is not None else [],
+                fingerprint=item.fingerprint,
             )
             session.add(item_model)
+        elif item.seq_update is None or (stored_item.seq_update is not None
+                                         and item.seq_update <= stored_item.seq_update):
+            # Skip items that are not newer than the stored version, together with their indicators
+            logger.debug(f"Skipping stale item: {item.id}")
+            stats.stale_items += 1
+            continue
+        elif stored_item.fingerprint == item.fingerprint:
+            # Content is unchanged, only seqUpdate moves forward so an older copy cannot win later
+            logger.debug(f"Updating only seqUpdate of unchanged item: {item.id}")
+            stats.unchanged_items += 1
+            seq_updates.append({"id": item.id, "seq_update": item.seq_update})
         else:
             # Debugging: Indicate that an existing item is being updated
             logger.debug(f"Updating existing item: {item.id}")
+            item_model = session.get(ItemModel, item.id)
             item_model.author = item.author if item.author is not None else item_model.author
             item_model.company_ids = item.company_ids if item.company_ids is not None else item_model.company_ids
             item_model.indicator_ids = item.indicator_ids if item.indicator_ids is not None else item_model.indicator_ids
@@ -57,6 +100,7 @@ def save_to_database(data_parser: DataParser, session):
             item_model.langs = item.langs if item.langs is not None else item_model.langs
             item_model.seq_update = item.seq_update if item.seq_update is not None else item_model.seq_update
             item_model.malware_list = item.malware_list if item.malware_list is not None else item_model.malware_list
+            item_model.fingerprint = item.fingerprint
 
         # Check if indicators is not None before processing
         if item.indicators is not None:
@@ -65,10 +109,9 @@ def save_to_database(data_parser: DataParser, session):
                 # Debugging: Log each indicator
                 logger.debug(f"Processing indicator: {indicator.__dict__}")
 
-                # Check if the indicator already exists in the database
-                indicator_model = session.query(IndicatorModel).filter_by(id=indicator.id).first()
+                stored_indicator = stored_indicators.get(indicator.id)
 
-                if indicator_model is None:
+                if stored_indicator is None:
                     # Create new indicator if it does not exist
                     logger.debug(f"Adding new indicator: {indicator.id}")
                     indicator_model = IndicatorModel(
@@ -78,21 +121,33 @@ def save_to_database(data_parser: DataParser, session):
                         deleted=indicator.deleted if indicator.deleted is not None else False,
                         description=indicator.description if indicator.description is not None else None,
                         domain=indicator.domain if indicator.domain is not None else None,
+                        fingerprint=indicator.fingerprint,
                         item_id=item.id
                     )
                     session.add(indicator_model)
+                elif stored_indicator.fingerprint == indicator.fingerprint:
+                    logger.debug(f"Skipping unchanged indicator: {indicator.id}")
+                    stats.unchanged_indicators += 1
                 else:
                     # Update existing indicator fields
                     logger.debug(f"Updating existing indicator: {indicator.id}")
+                    indicator_model = session.get(IndicatorModel, indicator.id)
                     indicator_model.date_first_seen = indicator.date_first_seen if indicator.date_first_seen is not None else indicator_model.date_first_seen
                     indicator_model.date_last_seen = indicator.date_last_seen if indicator.date_last_seen is not None else indicator_model.date_last_seen
                     indicator_model.deleted = indicator.deleted if indicator.deleted is not None else indicator_model.deleted
                     indicator_model.description = indicator.description if indicator.description is not None else indicator_model.description
                     indicator_model.domain = indicator.domain if indicator.domain is not None else indicator_model.domain
+                    indicator_model.fingerprint = indicator.fingerprint
+
+    if seq_updates:
+        # One executemany of UPDATE items SET seq_update=? WHERE id=?, without loading the rows
+        session.execute(update(ItemModel), seq_updates)
 
     # Commit all changes to the database
     session.commit()
     logger.info("Data successfully saved to the database.")
+    logger.info(f"Ingest summary: {stats}")
+    return stats
 
 @click.group()
 def cli():
@@ -101,37 +156,78 @@ def cli():
 
 
 @cli.command('get')
-def fetch_and_store_data():
+@click.option('--workers', '-w', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of processes used to parse the feed')
+@click.option('--fail-fast', is_flag=True, default=False,
+              help='Abort on the first item that does not match the feed schema instead of skipping it')
+@click.option('--no-cache', is_flag=True, default=False,
+              help='Always download from the server, bypassing the local cache')
+def fetch_and_store_data(workers, fail_fast, no_cache):
     """Fetch JSON data from the server and store it in the database."""
     server_url = f"{Config.SERVER_URL}/api/{Config.DEFAULT_API_VERSION}/get/data"
+    cache = None if no_cache else ResponseCache(Config.CACHE_DIR, Config.CACHE_MAX_BYTES, Config.CACHE_TTL)
 
-    logger.info("Fetching data from server...")
-    json_data = get_json_data(server_url)
+    try:
+        logger.info("Fetching data from server...")
+        raw_data = fetch_data(server_url, cache=cache)
 
-    if json_data is None:
-        logger.error("Error: Failed to fetch data from the server.")
-        return
+        if raw_data is None:
+            logger.error("Error: Failed to fetch data from the server.")
+            return
 
-    logger.info("Parsing and storing data...")
-    parser = DataParser(json_data)
+        logger.info("Parsing and storing data...")
+        try:
+            parser = parse_parallel(raw_data, workers, validate=True, fail_fast=fail_fast)
+        except ValueError as e:
+            # Covers both malformed JSON and SchemaError
+            logger.error(f"Error: Invalid feed, nothing was stored. {e}")
+            return
 
-    session = Session()
-    try:
-        save_to_database(parser, session)
-        logger.info("Data fetched and stored successfully.")
-    except Exception as e:
-        session.rollback()
-        logger.error(f"Error storing data: {e}")
+        if parser.errors:
+            logger.warning(f"Skipped {len(parser.errors)} schema errors in the feed:")
+            for error in parser.errors[:MAX_LOGGED_ERRORS]:
+                logger.warning(f"  {error}")
+
+        session = Session()
+        try:
+            save_to_database(parser, session)
+            logger.info("Data fetched and stored successfully.")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error storing data: {e}")
+        finally:
+            session.close()
     finally:
-        session.close()
+        # Logged last, so the stats also appear when the feed could not be parsed or stored
+        if cache is not None:
+            logger.info(f"Cache stats: {cache.stats}")
 
 
 @cli.command('post')
 @click.option('--file', '-f', type=click.Path(exists=True), help='Path to the JSON file to be posted')
-def post_data(file):
-    """Post JSON data or file to the server."""
+@click.option('--ndjson', type=click.Path(exists=True, dir_okay=False),
+              help='Path to a newline-delimited JSON file to stream in chunks')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=1000, show_default=True,
+              help='Number of NDJSON records sent per chunk')
+@click.option('--skip', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Number of NDJSON records already acknowledged, to resume an interrupted upload')
+def post_data(file, ndjson, chunk_size, skip):
+    """Post JSON data, a JSON file or an NDJSON file to the server."""
     server_url = f"{Config.SERVER_URL}/api/{Config.DEFAULT_API_VERSION}/add/data"
 
+    if file and ndjson:
+        logger.error("Error: --file and --ndjson cannot be used together.")
+        return
+
+    if ndjson:
+        logger.info(f"Streaming NDJSON file: {ndjson}")
+        succeeded, acknowledged = send_ndjson_data(server_url, ndjson, chunk_size=chunk_size, skip=skip)
+        if succeeded:
+            logger.info(f"NDJSON upload successful, {acknowledged} records stored.")
+        else:
+            logger.error(f"Error: Failed to send NDJSON data, resume with --skip {acknowledged}.")
+        return
+
     if file:
         logger.info(f"Uploading file: {file}")
         if not file.endswith('.json'):
@@ -150,5 +246,38 @@ def post_data(file):
         logger.error("Error: Failed to send POST request.")
 
 
+@cli.command('export')
+@click.option('--format', 'export_format', type=click.Choice(EXPORT_FORMATS), default='ndjson',
+              show_default=True, help='Output format')
+@click.option('--since', type=int, default=None, help='Only export items with a seqUpdate greater than this')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, allow_dash=True), default='-',
+              show_default=True, help='Output file, "-" for stdout')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=1000, show_default=True,
+              help='Number of items read from the database per chunk')
+def export_data(export_format, since, output, chunk_size):
+    """Export stored items in the feed's shape; a JSON export sent with `post --file` becomes the server's feed."""
+    session = Session()
+    try:
+        items = iter_feed_items(session, since=since, chunk_size=chunk_size)
+        if export_format == 'parquet':
+            if output == '-':
+                count = write_parquet(items, sys.stdout.buffer, chunk_size=chunk_size)
+            else:
+                with open(output, 'wb') as f:
+                    count = write_parquet(items, f, chunk_size=chunk_size)
+        else:
+            writer = write_json if export_format == 'json' else write_ndjson
+            if output == '-':
+                count = writer(items, sys.stdout)
+            else:
+                with open(output, 'w', encoding='utf-8') as f:
+                    count = writer(items, f)
+        logger.info(f"Exported {count} items as {export_format}.")
+    except Exception as e:
+        logger.error(f"Error exporting data: {e}")
+    finally:
+        session.close()
+
+
 if __name__ == "__main__":
     cli()
@@ -12,4 +12,10 @@ class Config:
     if DATABASE_URL is None:
         raise ValueError("DATABASE_URL environment variable is not set in the .env file")
 
-    DEFAULT_API_VERSION = os.getenv("DEFAULT_API_VERSION", "v2")
\ No newline at end of file
+    DEFAULT_API_VERSION = os.getenv("DEFAULT_API_VERSION", "v2")
+
+    # On-disk cache of server responses, shared by all client runs on this host
+    CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "homework_ib"))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+    # Seconds an entry is used without asking the server; 0 revalidates every fetch (a 304 reuses the body)
+    CACHE_TTL = float(os.getenv("CACHE_TTL", 0))
@@ -0,0 +1,132 @@
+import json
+from typing import IO, Dict, Iterator, List, Optional
+from sqlalchemy import select
+from flask_client.models import ItemModel, IndicatorModel
+
+EXPORT_FORMATS = ('ndjson', 'json', 'parquet')
+
+
+def indicator_to_feed(indicator: IndicatorModel) -> dict:
+    """Converts a stored indicator back to the feed's JSON shape."""
+    return {
+        "dateFirstSeen": indicator.date_first_seen,
+        "dateLastSeen": indicator.date_last_seen,
+        "deleted": indicator.deleted,
+        "description": indicator.description,
+        "domain": indicator.domain,
+        "id": indicator.id,
+    }
+
+
+def item_to_feed(item: ItemModel, indicators: List[IndicatorModel]) -> dict:
+    """Converts a stored item and its indicators back to the feed's JSON shape."""
+    return {
+        "author": item.author,
+        "companyId": item.company_ids,
+        "id": item.id,
+        "indicators": [indicator_to_feed(indicator) for indicator in indicators],
+        "indicatorsIds": item.indicator_ids,
+        "isPublished": item.is_published,
+        "isTailored": item.is_tailored,
+        "labels": item.labels,
+        "langs": item.langs,
+        "malwareList": item.malware_list,
+        "seqUpdate": item.seq_update,
+    }
+
+
+def iter_feed_items(session, since: Optional[int] = None, chunk_size: int = 1000) -> Iterator[dict]:
+    """Streams stored items in the feed's shape, ordered by id.
+
+    Items are read from a server-side cursor in chunks of chunk_size, and the indicators of
+    each chunk are fetched with one query, instead of one relationship load per item.
+    """
+    query = select(ItemModel).order_by(ItemModel.id).execution_options(yield_per=chunk_size)
+    if since is not None:
+        query = query.where(ItemModel.seq_update > since)
+
+    for chunk in session.execute(query).scalars().partitions():
+        indicators: Dict[str, List[IndicatorModel]] = {item.id: [] for item in chunk}
+        indicator_query = (select(IndicatorModel)
+                           .where(IndicatorModel.item_id.in_(list(indicators)))
+                           .order_by(IndicatorModel.id))
+        for indicator in session.execute(indicator_query).scalars():
+            indicators[indicator.item_id].append(indicator)
+
+        for item in chunk:
+            yield item_to_feed(item, indicators[item.id])
+        # Drop the exported chunk from the identity map so memory stays flat
+        session.expunge_all()
+
+
+def write_ndjson(items: Iterator[dict], stream: IO[str]) -> int:
+    """Writes one item per line and returns the number of items written."""
+    count = 0
+    for item in items:
+        stream.write(json.dumps(item, ensure_ascii=False))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+def write_json(items: Iterator[dict], stream: IO[str]) -> int:
+    """Writes a feed document ({"items", "count", "seqUpdate"}) without building it in memory."""
+    count = 0
+    seq_update = 0
+    stream.write('{"items": [')
+    for item in items:
+        if count:
+            stream.write(', ')
+        stream.write(json.dumps(item, ensure_ascii=False))
+        count += 1
+        seq_update = max(seq_update, item["seqUpdate"] or 0)
+    stream.write(f'], "count": {count}, "seqUpdate": {seq_update}}}\n')
+    return count
+
+
+def _parquet_schema(pa):
+    indicator = pa.struct([
+        ("dateFirstSeen", pa.string()),
+        ("dateLastSeen", pa.string()),
+        ("deleted", pa.bool_()),
+        ("description", pa.string()),
+        ("domain", pa.string()),
+        ("id", pa.string()),
+    ])
+    return pa.schema([
+        ("author", pa.string()),
+        ("companyId", pa.list_(pa.string())),
+        ("id", pa.string()),
+        ("indicators", pa.list_(indicator)),
+        ("indicatorsIds", pa.list_(pa.string())),
+        ("isPublished", pa.bool_()),
+        ("isTailored", pa.bool_()),
+        ("labels", pa.list_(pa.string())),
+        ("langs", pa.list_(pa.string())),
+        ("malwareList", pa.list_(pa.string())),
+        ("seqUpdate", pa.int64()),
+    ])
+
+
+def write_parquet(items: Iterator[dict], stream: IO[bytes], chunk_size: int = 1000) -> int:
+    """Writes items as Parquet row groups of chunk_size rows. Requires pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = _parquet_schema(pa)
+    count = 0
+    batch = []
+    with pq.ParquetWriter(stream, schema) as writer:
+        for item in items:
+            batch.append(item)
+            if len(batch) >= chunk_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
@@ -0,0 +1,218 @@
+import gc
+import io
+import mmap
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+from flask_client.parser import DataParser, Item, parse_valid_item
+from flask_common.feed import FeedDecodeError, FeedReader
+from flask_common.schema import SchemaError, validate_header
+
+# A comma followed by an opening brace: where an item of the items array may start
+_ITEM_START = re.compile(rb',[ \t\n\r]*\{')
+
+
+class _Range(NamedTuple):
+    """What a worker decoded from its byte range of the feed file."""
+    start: int  # Offset of the first item decoded
+    end: Optional[int]  # Offset of the next item or of the ']' closing the items array, None if stopped early
+    end_comma: Optional[int]  # Offset of the comma in front of the next item
+    closed: bool  # Whether the items array ended
+    count: int  # Number of items decoded, valid or not
+    rows: List[tuple]  # Item.to_row() of the valid items
+    errors: List[Tuple[int, SchemaError]]  # (index within the range, error) of the invalid items
+
+
+def _decode_range(f, start: int, stop: Optional[int], validate: bool, fail_fast: bool) -> Optional[_Range]:
+    """Decodes the items from offset start on, up to the first one whose leading comma is at or after stop.
+
+    With fail_fast, decoding stops at the first invalid item and None is returned for end.
+    """
+    reader = FeedReader(f, start)
+    if reader.peek() == ']':
+        return _Range(reader.offset, reader.offset, reader.offset, True, 0, [], [])
+
+    first = reader.offset
+    rows, errors = [], []
+    index = 0
+    while True:
+        data = reader.decode()[0]
+        if validate:
+            item_errors = []
+            item = parse_valid_item(data, index, item_errors)
+            errors.extend((index, error) for error in item_errors)
+        else:
+            item = Item(data)
+        if item is not None:
+            rows.append(item.to_row())
+        index += 1
+        if fail_fast and errors:
+            return _Range(first, None, None, False, index, rows, errors)
+
+        if reader.peek() == ']':
+            return _Range(first, reader.offset, reader.offset, True, index, rows, errors)
+        comma = reader.offset
+        reader.expect(',')
+        if stop is not None and comma >= stop:
+            reader.peek()
+            return _Range(first, reader.offset, comma, False, index, rows, errors)
+
+
+def _parse_range(path: str, start: int, stop: Optional[int], search: bool,
+                 validate: bool = False, fail_fast: bool = False) -> Optional[_Range]:
+    """Decodes the items of the feed file whose leading comma lies in [start, stop), in a worker process.
+
+    With search, start is an arbitrary offset: the range begins at the next comma followed by a brace,
+    which is checked by decoding from there. A brace inside an item can still pass this check, so the
+    parent compares the start with where the previous range ended. Returns None if nothing starts in range.
+    """
+    with open(path, 'rb') as f:
+        if not search:
+            return _decode_range(f, start, stop, validate, fail_fast)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            position = start
+            while True:
+                match = _ITEM_START.search(view, position, stop if stop is not None else len(view))
+                if match is None:
+                    return None
+                try:
+                    result = _decode_range(f, match.end() - 1, stop, validate, fail_fast)
+                except FeedDecodeError:
+                    result = None
+                # An array closing before stop is most likely a list inside an item
+                if result is not None and (stop is None or not result.closed):
+                    return result
+                position = match.start() + 1
+
+
+def _reindex(error: SchemaError, local: int, index: int) -> SchemaError:
+    """Returns the error of item local of a range with the item's position index in the whole feed."""
+    return SchemaError(f"items[{index}]" + error.path[len(f"items[{local}]"):], error.message)
+
+
+def _merge_ranges(raw_data: bytes, bounds: List[Optional[int]], validate: bool, fail_fast: bool):
+    """Runs _parse_range on the byte ranges between bounds and joins the results in feed order.
+
+    Returns the items, the schema errors and the offset of the ']' closing the items array.
+    """
+    with tempfile.NamedTemporaryFile(suffix='.json') as f, ProcessPoolExecutor(max_workers=len(bounds) - 1) as pool:
+        f.write(raw_data)
+        f.flush()
+        futures = [pool.submit(_parse_range, f.name, bounds[k], bounds[k + 1], k > 0, validate, fail_fast)
+                   for k in range(len(bounds) - 1)]
+
+        items, errors = [], []
+        count = 0
+        end, end_comma, closed = bounds[0], bounds[0], False
+        try:
+            for k, future in enumerate(futures):
+                stop = bounds[k + 1]
+                if k > 0 and (closed or (stop is not None and end_comma >= stop)):
+                    continue  # No item starts in this range
+                result = future.result()
+                if k > 0 and (result is None or result.start != end):
+                    result = pool.submit(_parse_range, f.name, end, stop, False, validate, fail_fast).result()
+
+                items.extend(Item.from_row(row) for row in result.rows)
+                errors.extend(_reindex(error, local, count + local) for local, error in result.errors)
+                if fail_fast and errors:
+                    raise errors[0]
+                count += result.count
+                end, end_comma, closed = result.end, result.end_comma, result.closed
+        finally:
+            for future in futures:
+                future.cancel()
+    return items, errors, end
+
+
+def parse_parallel(raw_data: bytes, workers: int, validate: bool = False, fail_fast: bool = False) -> DataParser:
+    """Parses a feed document across a process pool, each worker decoding its own byte range.
+
+    The document is written to a temporary file and cut into one byte range per worker. Workers find
+    the first item boundary in their range, decode and validate the items there and send them back
+    as plain tuples, so the parent neither decodes the JSON nor unpickles Item objects. A range whose start
+    does not line up with the end of the previous one is decoded again from that end. The result is
+    the same as DataParser.from_feed(io.BytesIO(raw_data), validate, fail_fast).
+    """
+    reader = FeedReader(io.BytesIO(raw_data))
+    if workers <= 1 or not reader.open_items():
+        return DataParser.from_feed(io.BytesIO(raw_data), validate=validate, fail_fast=fail_fast)
+
+    first = reader.offset
+    bounds = [first + (len(raw_data) - first) * k // workers for k in range(workers)] + [None]
+    # Rebuilding the items from rows allocates millions of acyclic objects, on which the cyclic
+    # garbage collector would spend about half of the parent's time
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        items, errors, end = _merge_ranges(raw_data, bounds, validate, fail_fast)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    tail = FeedReader(io.BytesIO(raw_data), end)
+    if tail.close_items():
+        # A second items array, rare enough not to be worth splitting
+        return DataParser.from_feed(io.BytesIO(raw_data), validate=validate, fail_fast=fail_fast)
+    header = dict(reader.header, **tail.header)
+    if validate:
+        header_errors = validate_header(header)
+        if fail_fast and header_errors:
+            raise header_errors[0]
+        errors[:0] = header_errors
+    return DataParser.from_items(header, items, errors)
+
+
+class IngestStats:
+    """Counters reported at the end of an ingest run."""
+
+    def __init__(self):
+        self.duplicate_items: int = 0
+        self.duplicate_indicators: int = 0
+        self.stale_items: int = 0
+        self.unchanged_items: int = 0
+        self.unchanged_indicators: int = 0
+
+    def __str__(self):
+        return (f"duplicate items: {self.duplicate_items}, "
+                f"duplicate indicators: {self.duplicate_indicators}, "
+                f"stale items skipped: {self.stale_items}, "
+                f"unchanged items (seqUpdate only): {self.unchanged_items}, "
+                f"unchanged indicators skipped: {self.unchanged_indicators}")
+
+
+def _seq(item: Item) -> int:
+    return item.seq_update if item.seq_update is not None else 0
+
+
+def dedup_items(items: List[Item], stats: IngestStats) -> List[Item]:
+    """Collapses duplicate items and indicators within a batch.
+
+    For each item id the copy with the highest seqUpdate wins (the later one on ties).
+    An indicator listed more than once is kept only under the newest item carrying it.
+    Items keep the position of their first occurrence in the feed.
+    """
+    latest = {}
+    for item in items:
+        current = latest.get(item.id)
+        if current is not None:
+            stats.duplicate_items += 1
+            if _seq(item) < _seq(current):
+                continue
+        latest[item.id] = item
+
+    winners = {}
+    for item in latest.values():
+        for indicator in item.indicators or []:
+            current = winners.get(indicator.id)
+            if current is not None:
+                stats.duplicate_indicators += 1
+                if _seq(item) < _seq(current[0]):
+                    continue
+            winners[indicator.id] = (item, indicator)
+
+    for item in latest.values():
+        if item.indicators is not None:
+            item.indicators = [ind for ind in item.indicators if winners[ind.id][1] is ind]
+    return list(latest.values())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, ForeignKey
+from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, inspect, text
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.dialects.sqlite import JSON
 
@@ -14,6 +14,7 @@ class IndicatorModel(Base):
     deleted = Column(Boolean, default=False)
     description = Column(String)
     domain = Column(String)
+    fingerprint = Column(String)  # Content hash computed by the parser, used to skip no-op updates
     item_id = Column(String, ForeignKey('items.id'), nullable=False)
 
 
@@ -30,5 +31,27 @@ class ItemModel(Base):
     langs = Column(JSON, default=[])  # Stored as JSON array of languages
     seq_update = Column(Integer, default=0)
     malware_list = Column(JSON, default=[])  # Store malwareList as a JSON array
-
-    indicators = relationship('IndicatorModel', backref='item', cascade="all, delete-orphan")
\ No newline at end of file
+    fingerprint = Column(String)  # Content hash computed by the parser, used to skip no-op updates
+
+    indicators = relationship('IndicatorModel', backref='item', cascade="all, delete-orphan")
+
+
+def add_missing_columns(engine):
+    """Adds the model columns that are missing from tables created by an older version.
+
+    create_all() only creates missing tables, so an existing database keeps its old columns and every
+    query on a newer column fails. New columns are nullable: rows whose fingerprint is NULL never
+    match an incoming one, so they are rewritten once on their next ingest.
+    """
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {quote(table.name)} "
+                                            f"ADD COLUMN {quote(column.name)} {column_type}"))
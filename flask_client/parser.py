@@ -1,4 +1,15 @@
+import hashlib
+import json
+from operator import attrgetter
 from typing import List, Optional
+from flask_common.feed import FeedReader
+from flask_common.schema import SchemaError, validate_header, validate_item
+
+
+def fingerprint(*values) -> str:
+    """Returns a stable content hash of the given JSON-serializable values."""
+    payload = json.dumps(values, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
 
 class Indicator:
     def __init__(self, data: dict):
@@ -8,6 +19,18 @@ class Indicator:
         self.deleted: bool = data.get('deleted', False)
         self.description: Optional[str] = data.get('description')
         self.domain: Optional[str] = data.get('domain')
+        self.fingerprint: str = fingerprint(self.date_first_seen, self.date_last_seen, self.deleted,
+                                            self.description, self.domain)
+
+    def to_row(self) -> tuple:
+        """Returns the attributes as a plain tuple, which pickles several times faster than the object."""
+        return _indicator_row(self)
+
+    @classmethod
+    def from_row(cls, row: tuple) -> 'Indicator':
+        indicator = cls.__new__(cls)
+        indicator.__dict__.update(zip(INDICATOR_ATTRIBUTES, row))
+        return indicator
 
 class Item:
     def __init__(self, data: dict):
@@ -22,9 +45,95 @@ class Item:
         self.langs: List[str] = data.get('langs', [])
         self.malware_list: List[str] = data.get('malwareList', [])
         self.seq_update: int = data.get('seqUpdate', 0)
+        # seqUpdate is left out on purpose: a newer sequence number with the same content is a no-op
+        self.fingerprint: str = fingerprint(self.author, self.company_ids, self.indicator_ids,
+                                            self.is_published, self.is_tailored, self.labels,
+                                            self.langs, self.malware_list)
+
+    def to_row(self) -> tuple:
+        """Returns the attributes as a plain tuple, with the indicators as rows in the last field."""
+        return _item_row(self) + (tuple(indicator.to_row() for indicator in self.indicators),)
+
+    @classmethod
+    def from_row(cls, row: tuple) -> 'Item':
+        item = cls.__new__(cls)
+        item.__dict__.update(zip(ITEM_ATTRIBUTES, row))
+        item.indicators = [Indicator.from_row(indicator) for indicator in row[-1]]
+        return item
+
+
+# Attribute order of the rows built by to_row()
+INDICATOR_ATTRIBUTES = ('id', 'date_first_seen', 'date_last_seen', 'deleted', 'description', 'domain', 'fingerprint')
+ITEM_ATTRIBUTES = ('id', 'author', 'company_ids', 'indicator_ids', 'is_published', 'is_tailored', 'labels',
+                   'langs', 'malware_list', 'seq_update', 'fingerprint')
+_indicator_row = attrgetter(*INDICATOR_ATTRIBUTES)
+_item_row = attrgetter(*ITEM_ATTRIBUTES)
+
+def parse_valid_item(data, index: int, errors: List[SchemaError], fail_fast: bool = False) -> Optional[Item]:
+    """Validates one raw item and builds it, or records its errors and returns None."""
+    item_errors = validate_item(data, index)
+    if not item_errors:
+        return Item(data)
+    if fail_fast:
+        raise item_errors[0]
+    errors.extend(item_errors)
+    return None
+
+
+def feed_items(json_data: dict, errors: List[SchemaError], fail_fast: bool = False) -> list:
+    """Validates the feed header and returns its raw items, or an empty list if they are unusable."""
+    errors.extend(validate_header(json_data))
+    if fail_fast and errors:
+        raise errors[0]
+    items = json_data.get('items', [])
+    return items if isinstance(items, list) else []
 
 class DataParser:
-    def __init__(self, json_data: dict):
+    def __init__(self, json_data: dict, validate: bool = False, fail_fast: bool = False):
+        """Parses the feed; with validate, items failing the schema are skipped and listed in errors.
+
+        With fail_fast as well, the first invalid item raises SchemaError before later items are parsed.
+        """
         self.count: int = json_data.get('count', 0)
-        self.items: List[Item] = [Item(item) for item in json_data.get('items', [])]
-        self.seq_update: int = json_data.get('seqUpdate', 0)
\ No newline at end of file
+        self.errors: List[SchemaError] = []
+        if validate:
+            # Each item is validated right before it is built, so fail_fast stops at the first bad item
+            items = (parse_valid_item(data, index, self.errors, fail_fast)
+                     for index, data in enumerate(feed_items(json_data, self.errors, fail_fast)))
+            self.items: List[Item] = [item for item in items if item is not None]
+        else:
+            self.items: List[Item] = [Item(item) for item in json_data.get('items', [])]
+        self.seq_update: int = json_data.get('seqUpdate', 0)
+
+    @classmethod
+    def from_items(cls, json_data: dict, items: List[Item],
+                   errors: Optional[List[SchemaError]] = None) -> 'DataParser':
+        """Builds a parser from the feed header and already parsed items."""
+        parser = cls({key: value for key, value in json_data.items() if key != 'items'})
+        parser.items = items
+        parser.errors = errors if errors is not None else []
+        return parser
+
+    @classmethod
+    def from_feed(cls, source, validate: bool = False, fail_fast: bool = False) -> 'DataParser':
+        """Parses a feed from a binary file, decoding and validating one item at a time.
+
+        Unlike DataParser(json.load(source)), fail_fast stops at the first invalid item before the rest
+        of the file is decoded. Malformed JSON raises FeedDecodeError.
+        """
+        reader = FeedReader(source)
+        items = []
+        errors = []
+        for index, data, _, _ in reader.iter_items():
+            item = parse_valid_item(data, index, errors, fail_fast) if validate else Item(data)
+            if item is not None:
+                items.append(item)
+
+        header = reader.header
+        if validate:
+            # The top-level fields after the items are only known at the end of the document
+            header_errors = validate_header(header)
+            if fail_fast and header_errors:
+                raise header_errors[0]
+            errors[:0] = header_errors
+        return cls.from_items(header if isinstance(header, dict) else {}, items, errors)
\ No newline at end of file
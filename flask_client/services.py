@@ -1,20 +1,170 @@
+import hashlib
+import json
 import logging
+import os
+import tempfile
+import time
 import requests
+from typing import Optional
+from filelock import FileLock
 # Setup logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def get_json_data(endpoint: str):
-    """Sends a GET request to retrieve the JSON data."""
+
+class CacheStats:
+    """Counters of a ResponseCache, reported at the end of a run."""
+
+    def __init__(self):
+        self.hits: int = 0
+        self.revalidated: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __str__(self):
+        return (f"hits: {self.hits}, revalidated: {self.revalidated}, "
+                f"misses: {self.misses}, evictions: {self.evictions}")
+
+
+class ResponseCache:
+    """On-disk cache of GET responses keyed by URL, shared by processes on the same host.
+
+    Each entry is one file holding a JSON metadata line followed by the body, written to a
+    temporary file and renamed into place, so readers never see a partial entry and need no lock.
+    Writers and eviction hold a file lock. The mtime of an entry is when it was stored or last
+    revalidated, and its atime when it was last used. Entries younger than ttl are served without a
+    request; older ones are revalidated with If-None-Match/If-Modified-Since. Once the entries
+    exceed max_bytes, the least recently used ones (oldest atime) are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.entry')
+
+    def _lock(self) -> FileLock:
+        return FileLock(os.path.join(self.directory, '.lock'))
+
+    def lookup(self, url: str):
+        """Returns (metadata, body) of the cached entry for url, or None."""
+        path = self._path(url)
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+                stored_at = os.fstat(f.fileno()).st_mtime
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url:
+            return None
+        meta['stored_at'] = stored_at
+        try:
+            os.utime(path, (time.time(), stored_at))  # Mark as recently used for LRU eviction
+        except OSError:
+            pass
+        return meta, body
+
+    def is_fresh(self, meta: dict) -> bool:
+        return time.time() - meta['stored_at'] < self.ttl
+
+    def store(self, url: str, response: requests.Response):
+        """Stores the response body with its validators, then evicts down to max_bytes."""
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+        }
+        self.write(url, meta, body)
+
+    def write(self, url: str, meta: dict, body: bytes):
+        try:
+            self._write(url, meta, body)
+        except OSError as e:
+            # The cache is an optimisation, a full or read-only disk must not fail the fetch
+            logger.warning(f"Could not write to the cache: {e}")
+
+    def _write(self, url: str, meta: dict, body: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock():
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(json.dumps(meta).encode('utf-8') + b'\n')
+                    f.write(body)
+                os.replace(tmp_path, self._path(url))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._evict()
+
+    def refresh(self, url: str):
+        """Restarts the TTL of an entry the server confirmed as unchanged, by touching its mtime only."""
+        try:
+            os.utime(self._path(url))
+        except OSError as e:
+            logger.warning(f"Could not refresh the cache entry: {e}")
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.entry'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+            self.stats.evictions += 1
+
+
+def fetch_data(endpoint: str, cache: ResponseCache = None) -> Optional[bytes]:
+    """Sends a GET request and returns the raw JSON body, reading through cache if one is given."""
+    cached = cache.lookup(endpoint) if cache is not None else None
+    if cached is not None and cache.is_fresh(cached[0]):
+        cache.stats.hits += 1
+        return cached[1]
+
+    headers = {}
+    if cached is not None:
+        if cached[0].get("etag"):
+            headers["If-None-Match"] = cached[0]["etag"]
+        if cached[0].get("last_modified"):
+            headers["If-Modified-Since"] = cached[0]["last_modified"]
+
     try:
-        response = requests.get(endpoint)
+        response = requests.get(endpoint, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            cache.stats.revalidated += 1
+            if cache.ttl > 0:  # Without a TTL every use revalidates, there is nothing to restart
+                cache.refresh(endpoint)
+            return cached[1]
         response.raise_for_status()  # Check for HTTP errors
 
         # Check if the response is JSON
         if response.headers.get("Content-Type") == "application/json":
-            return response.json()
+            if cache is not None:
+                cache.stats.misses += 1
+                cache.store(endpoint, response)
+            return response.content
         else:
-            logger.error("Error: Expected JSON response, got:", response.text)
+            logger.error(f"Error: Expected JSON response, got: {response.text}")
             return None
 
     except requests.exceptions.Timeout:
@@ -28,6 +178,12 @@ def get_json_data(endpoint: str):
     return None
 
 
+def get_json_data(endpoint: str, cache: ResponseCache = None):
+    """Sends a GET request to retrieve the JSON data, reading through cache if one is given."""
+    body = fetch_data(endpoint, cache)
+    return json.loads(body) if body is not None else None
+
+
 def send_post_data(endpoint: str, data=None, file=None):
     """Sends a POST request with JSON data or file."""
     try:
@@ -48,3 +204,54 @@ def send_post_data(endpoint: str, data=None, file=None):
     except requests.exceptions.RequestException as e:
         logger.error(f"Error during GET request: {e}")
     return None, None
+
+
+def iter_ndjson_chunks(file: str, chunk_size: int, skip: int = 0):
+    """Yields lists of up to chunk_size NDJSON lines, skipping blank lines and the first `skip` records."""
+    chunk = []
+    with open(file, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if skip:
+                skip -= 1
+                continue
+            chunk.append(line if line.endswith(b'\n') else line + b'\n')
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def send_ndjson_data(endpoint: str, file: str, chunk_size: int = 1000, skip: int = 0):
+    """Streams an NDJSON file to the server in chunks over one keep-alive connection.
+
+    Each chunk is sent as its own request with chunked transfer encoding and acknowledged by
+    the server. Returns whether the whole file was sent and the number of records acknowledged
+    so far, counting the skipped ones, which is the `skip` value to resume from.
+    """
+    acknowledged = skip
+    with requests.Session() as session:
+        for chunk in iter_ndjson_chunks(file, chunk_size, skip):
+            try:
+                # A generator body makes requests use chunked transfer encoding
+                response = session.post(endpoint, data=iter(chunk),
+                                        headers={'Content-Type': 'application/x-ndjson'})
+                response.raise_for_status()
+            except requests.exceptions.Timeout:
+                logger.error("Error: The request timed out.")
+                return False, acknowledged
+            except requests.exceptions.ConnectionError:
+                logger.error("Error: Failed to connect to the server.")
+                return False, acknowledged
+            except requests.exceptions.HTTPError as http_err:
+                logger.error(f"HTTP error occurred: {http_err}")
+                return False, acknowledged
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error during POST request: {e}")
+                return False, acknowledged
+
+            acknowledged += response.json().get('records', 0)
+            logger.info(f"Chunk acknowledged, {acknowledged} records stored.")
+    return True, acknowledged
@@ -0,0 +1,169 @@
+import json
+import re
+from typing import Iterator, Tuple
+
+# Bytes read from the source at a time
+READ_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+_decoder = json.JSONDecoder()
+
+
+class FeedDecodeError(ValueError):
+    """Malformed JSON in a feed, with the byte offset where decoding failed."""
+
+    def __init__(self, message: str, position: int):
+        super().__init__(message, position)
+        self.message = message
+        self.position = position
+
+    def __str__(self):
+        return f"{self.message} at byte {self.position}"
+
+
+class FeedReader:
+    """Decodes a feed document from a binary file one top-level value at a time.
+
+    Blocks of the file are decoded as latin-1, which maps every byte to one character, so positions
+    in the text are byte offsets into the file. Values containing non-ASCII bytes are decoded again
+    from their UTF-8 bytes. Only the value being decoded is held as text, so each item can be
+    validated and handled before the rest of the document is decoded.
+    """
+
+    def __init__(self, source, offset: int = 0, read_size: int = READ_SIZE):
+        if offset:
+            source.seek(offset)
+        self.source = source
+        self.read_size = read_size
+        self.text = ''
+        self.pos = 0
+        self.base = offset  # Byte offset of text[0] in the file
+        self.eof = False
+        self.header = {}
+
+    @property
+    def offset(self) -> int:
+        """Byte offset of the current position in the file."""
+        return self.base + self.pos
+
+    def _fill(self) -> bool:
+        """Appends the next block to the text, dropping what was consumed; False at the end of the file."""
+        if self.eof:
+            return False
+        # Read at least as much as is pending, so a large value is rescanned a bounded number of times
+        block = self.source.read(max(self.read_size, len(self.text) - self.pos))
+        if not block:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + block.decode('latin-1')
+        self.base += self.pos
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, or '' at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or not self._fill():
+                return self.text[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        """Consumes char after optional whitespace."""
+        if self.peek() != char:
+            raise FeedDecodeError(f"Expecting {char!r}", self.offset)
+        self.pos += 1
+
+    def decode(self) -> Tuple[object, int, int]:
+        """Decodes the value at the current position; returns it with its start and end byte offsets."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError as e:
+                # A value cut off by the end of the block looks malformed until the next block is read
+                truncated = e.msg.startswith('Unterminated string') or e.pos >= len(self.text) - 6
+                if truncated and self._fill():
+                    continue
+                raise FeedDecodeError(e.msg, self.base + e.pos) from None
+            # A number running up to the end of the block may go on in the next one
+            if (not isinstance(value, (int, float)) or _NUMBER_TAIL.match(self.text, end).end() < len(self.text)
+                    or not self._fill()):
+                break
+
+        start = self.offset
+        if not self.text.isascii():
+            raw = self.text[self.pos:end]
+            if not raw.isascii():
+                try:
+                    value = json.loads(raw.encode('latin-1'))
+                except UnicodeDecodeError:
+                    raise FeedDecodeError("Invalid UTF-8", start) from None
+        self.pos = end
+        return value, start, self.base + end
+
+    def _expect_end(self):
+        if self.peek():
+            raise FeedDecodeError("Extra data", self.offset)
+
+    def _read_fields(self) -> bool:
+        """Reads "key": value pairs into header until the items array (True) or the end of the object (False)."""
+        while True:
+            key, start, _ = self.decode()
+            if not isinstance(key, str):
+                raise FeedDecodeError("Expecting property name enclosed in double quotes", start)
+            self.expect(':')
+            if key == 'items' and self.peek() == '[':
+                self.pos += 1
+                return True
+            self.header[key] = self.decode()[0]
+            if self.peek() != ',':
+                self.expect('}')
+                self._expect_end()
+                return False
+            self.pos += 1
+
+    def open_items(self) -> bool:
+        """Reads the top-level fields in front of the items array and enters it.
+
+        Returns False if there is no items array, the whole document has then been read into header.
+        A document that is not an object is decoded whole into header, for validation to reject it.
+        """
+        if self.peek() != '{':
+            self.header = self.decode()[0]
+            self._expect_end()
+            return False
+        self.pos += 1
+        if self.peek() == '}':
+            self.pos += 1
+            self._expect_end()
+            return False
+        return self._read_fields()
+
+    def close_items(self) -> bool:
+        """Reads the ']' ending the items array and the top-level fields after it, see open_items."""
+        self.expect(']')
+        if self.peek() != ',':
+            self.expect('}')
+            self._expect_end()
+            return False
+        self.pos += 1
+        return self._read_fields()
+
+    def iter_items(self) -> Iterator[Tuple[int, object, int, int]]:
+        """Yields (index, item, start, end) for each element of the items array, with its byte offsets.
+
+        The other top-level fields are in header once the iteration is complete.
+        """
+        index = 0
+        inside = self.open_items()
+        while inside:
+            if self.peek() != ']':
+                while True:
+                    value, start, end = self.decode()
+                    yield index, value, start, end
+                    index += 1
+                    if self.peek() != ',':
+                        break
+                    self.pos += 1
+            inside = self.close_items()
@@ -0,0 +1,158 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from flask_common.feed import FeedReader
+
+# Field specs for the feed format of example.json: name -> (type, array element type, required, nullable).
+# Unknown fields are allowed. The specs are compiled once into checker functions at import time.
+INDICATOR_FIELDS = {
+    'id': ('string', None, True, False),
+    'dateFirstSeen': ('string', None, False, True),
+    'dateLastSeen': ('string', None, False, True),
+    'deleted': ('boolean', None, False, True),
+    'description': ('string', None, False, True),
+    'domain': ('string', None, False, True),
+}
+
+ITEM_FIELDS = {
+    'id': ('string', None, True, False),
+    'author': ('string', None, False, True),
+    'companyId': ('array', 'string', False, True),
+    'indicators': ('array', 'indicator', False, False),
+    'indicatorsIds': ('array', 'string', False, True),
+    'isPublished': ('boolean', None, False, True),
+    'isTailored': ('boolean', None, False, True),
+    'labels': ('array', 'string', False, True),
+    'langs': ('array', 'string', False, True),
+    'malwareList': ('array', 'string', False, True),
+    'seqUpdate': ('integer', None, False, True),
+}
+
+FEED_FIELDS = {
+    'count': ('integer', None, False, True),
+    'items': ('array', None, False, False),
+    'seqUpdate': ('integer', None, False, True),
+}
+
+
+class SchemaError(ValueError):
+    """A feed value that does not match the schema, with the path to it (e.g. items[3].indicators[0].id)."""
+
+    def __init__(self, path: str, message: str):
+        super().__init__(path, message)
+        self.path = path
+        self.message = message
+
+    def __str__(self):
+        return f"{self.path or '<root>'}: {self.message}"
+
+
+Checker = Callable[[object, str, List[SchemaError]], None]
+
+_SCALAR_TYPES = {
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+}
+
+
+def _compile_value(kind: str, element: Optional[str], nested: Dict[str, Checker]) -> Checker:
+    if kind in nested:
+        return nested[kind]
+    if kind in _SCALAR_TYPES:
+        is_valid = _SCALAR_TYPES[kind]
+
+        def check_scalar(value, path, errors):
+            if not is_valid(value):
+                errors.append(SchemaError(path, f"expected {kind}, got {type(value).__name__}"))
+        return check_scalar
+
+    check_element = _compile_value(element, None, nested) if element else None
+
+    def check_array(value, path, errors):
+        if not isinstance(value, list):
+            errors.append(SchemaError(path, f"expected array, got {type(value).__name__}"))
+        elif check_element is not None:
+            for index, element_value in enumerate(value):
+                check_element(element_value, f"{path}[{index}]", errors)
+    return check_array
+
+
+def _compile_object(fields: Dict[str, Tuple], nested: Dict[str, Checker]) -> Checker:
+    compiled = [(name, _compile_value(kind, element, nested), required, nullable)
+                for name, (kind, element, required, nullable) in fields.items()]
+
+    def check_object(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append(SchemaError(path, f"expected object, got {type(value).__name__}"))
+            return
+        for name, check, required, nullable in compiled:
+            field_path = f"{path}.{name}" if path else name
+            if name not in value:
+                if required:
+                    errors.append(SchemaError(field_path, "missing required field"))
+            elif value[name] is None:
+                if not nullable:
+                    errors.append(SchemaError(field_path, "must not be null"))
+            else:
+                check(value[name], field_path, errors)
+    return check_object
+
+
+_check_indicator = _compile_object(INDICATOR_FIELDS, {})
+_check_item = _compile_object(ITEM_FIELDS, {'indicator': _check_indicator})
+_check_feed_header = _compile_object(FEED_FIELDS, {})
+
+
+def validate_item(data, index: int) -> List[SchemaError]:
+    """Returns the schema errors of the item at position index of the feed."""
+    errors = []
+    _check_item(data, f"items[{index}]", errors)
+    return errors
+
+
+def validate_record(data) -> List[SchemaError]:
+    """Returns the schema errors of an item sent on its own (e.g. as an NDJSON line), with paths relative to it."""
+    errors = []
+    _check_item(data, "", errors)
+    return errors
+
+
+def validate_header(json_data) -> List[SchemaError]:
+    """Returns the schema errors of the feed's top-level fields, without looking into the items."""
+    errors = []
+    _check_feed_header(json_data, "", errors)
+    return errors
+
+
+def validate_feed(json_data, fail_fast: bool = False) -> List[SchemaError]:
+    """Validates a whole feed item by item.
+
+    With fail_fast the first error is raised as SchemaError instead of collecting all of them.
+    """
+    errors = validate_header(json_data)
+    if isinstance(json_data, dict) and isinstance(json_data.get('items'), list) and not (fail_fast and errors):
+        for index, data in enumerate(json_data['items']):
+            errors.extend(validate_item(data, index))
+            if fail_fast and errors:
+                break
+    if fail_fast and errors:
+        raise errors[0]
+    return errors
+
+
+def validate_feed_file(source, fail_fast: bool = False) -> List[SchemaError]:
+    """Validates a feed read from a binary file, decoding and checking one item at a time.
+
+    The document is never decoded as a whole, so with fail_fast the first invalid item is raised as soon
+    as it is read. Malformed JSON raises FeedDecodeError.
+    """
+    reader = FeedReader(source)
+    errors = []
+    for index, data, _, _ in reader.iter_items():
+        errors.extend(validate_item(data, index))
+        if fail_fast and errors:
+            raise errors[0]
+    # The top-level fields after the items are only known at the end of the document
+    errors[:0] = validate_header(reader.header)
+    if fail_fast and errors:
+        raise errors[0]
+    return errors
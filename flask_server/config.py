@@ -1,4 +1,20 @@
+import os
+
+
 class Config:
     DEBUG = True
     JSON_AS_ASCII = False  # Ensure proper UTF-8 encoding for JSON responses
+    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')  # Where uploads are stored
     JSON_FILE = 'example.json'
+    NDJSON_FILE = 'data.ndjson'  # Records uploaded as application/x-ndjson are appended here
+    MAX_CONTENT_LENGTH = 512 * 1024 * 1024  # Larger request bodies are rejected with 413
+    # Set to True behind a front server that honours X-Sendfile, so it sends stored files itself.
+    # Otherwise send_file hands the file to the WSGI server's wsgi.file_wrapper (sendfile in gunicorn).
+    USE_X_SENDFILE = False
+    SLICE_MAX_ITEMS = 1000  # Largest `limit` accepted by /get/data/items
+
+    # Admission control for the v2 API
+    RATE_LIMIT_PER_SECOND = 10  # Tokens refilled per client per second
+    RATE_LIMIT_BURST = 20  # Requests a client may send at once before being limited
+    MAX_CONCURRENT_TRANSFERS = 4  # Uploads and downloads served at the same time
+    TRANSFER_QUEUE_TIMEOUT = 1.0  # Seconds a transfer waits for a free slot before a 429
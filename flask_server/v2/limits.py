@@ -0,0 +1,178 @@
+import math
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, make_response, request
+
+# Idle buckets are pruned once this many clients are tracked
+MAX_TRACKED_CLIENTS = 10000
+
+# Endpoints that are never rate limited, so monitoring keeps working under overload
+RATE_LIMIT_EXEMPT = {'v2.get_stats'}
+
+_init_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `burst` tokens."""
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Takes a token and returns 0, or returns the seconds to wait for the next token."""
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionControl:
+    """Per-client rate limits and a cap on concurrent transfers, with counters for monitoring."""
+
+    def __init__(self, config):
+        self.rate = config['RATE_LIMIT_PER_SECOND']
+        self.burst = config['RATE_LIMIT_BURST']
+        self.max_transfers = config['MAX_CONCURRENT_TRANSFERS']
+        self.queue_timeout = config['TRANSFER_QUEUE_TIMEOUT']
+        self.buckets = {}
+        self.transfers = threading.BoundedSemaphore(self.max_transfers)
+        self.lock = threading.Lock()
+        self.active_transfers = 0
+        self.queued_transfers = 0
+        self.rate_limited = 0
+        self.transfers_rejected = 0
+
+    def check_rate(self, client: str) -> float:
+        """Returns 0 if the client may proceed, or the seconds it should wait."""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                if len(self.buckets) >= MAX_TRACKED_CLIENTS:
+                    self._prune(now)
+                bucket = self.buckets[client] = TokenBucket(self.rate, self.burst, now)
+            wait = bucket.take(now)
+            if wait:
+                self.rate_limited += 1
+            return wait
+
+    def _prune(self, now: float):
+        for client, bucket in list(self.buckets.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.burst:
+                del self.buckets[client]
+
+    def acquire_transfer(self) -> bool:
+        """Waits up to TRANSFER_QUEUE_TIMEOUT seconds for a transfer slot."""
+        with self.lock:
+            self.queued_transfers += 1
+        acquired = self.transfers.acquire(timeout=self.queue_timeout)
+        with self.lock:
+            self.queued_transfers -= 1
+            if acquired:
+                self.active_transfers += 1
+            else:
+                self.transfers_rejected += 1
+        return acquired
+
+    def release_transfer(self):
+        with self.lock:
+            self.active_transfers -= 1
+        self.transfers.release()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "active_transfers": self.active_transfers,
+                "queued_transfers": self.queued_transfers,
+                "max_transfers": self.max_transfers,
+                "rate_limited": self.rate_limited,
+                "transfers_rejected": self.transfers_rejected,
+                "tracked_clients": len(self.buckets),
+            }
+
+
+def get_admission_control() -> AdmissionControl:
+    """Returns the app's AdmissionControl, created from the app config on first use."""
+    extensions = current_app.extensions
+    if 'v2_admission_control' not in extensions:
+        with _init_lock:
+            if 'v2_admission_control' not in extensions:
+                extensions['v2_admission_control'] = AdmissionControl(current_app.config)
+    return extensions['v2_admission_control']
+
+
+def too_many_requests(message: str, retry_after: float):
+    response = jsonify({"error": message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limit():
+    """before_request hook rejecting clients that ran out of tokens with 429."""
+    if request.endpoint in RATE_LIMIT_EXEMPT:
+        return None
+    wait = get_admission_control().check_rate(request.remote_addr or 'unknown')
+    if wait:
+        return too_many_requests("Rate limit exceeded", wait)
+    return None
+
+
+def release_on_close(response, callback):
+    """Runs callback once the WSGI server closes the response body.
+
+    Werkzeug skips call_on_close callbacks for direct passthrough bodies (send_file), so for
+    those the callback is chained onto the file wrapper's own close().
+    """
+    done = []
+
+    def run_once():
+        if not done:
+            done.append(True)
+            callback()
+
+    body = response.response
+    if response.direct_passthrough and hasattr(body, 'close'):
+        close = body.close
+
+        def close_and_run():
+            try:
+                close()
+            finally:
+                run_once()
+        body.close = close_and_run
+    elif response.direct_passthrough:
+        # Nothing left to stream here, e.g. X-Sendfile handed the file to the front server
+        run_once()
+    response.call_on_close(run_once)
+
+
+def transfer_slot(view):
+    """Limits how many requests of the decorated view move data at the same time.
+
+    The slot is held until the response is closed, so streamed file downloads count
+    for their whole duration and not just until the view returns.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        control = get_admission_control()
+        if not control.acquire_transfer():
+            return too_many_requests("Too many concurrent transfers", control.queue_timeout)
+        try:
+            response = make_response(view(*args, **kwargs))
+        except BaseException:
+            control.release_transfer()
+            raise
+        release_on_close(response, control.release_transfer)
+        return response
+    return wrapper
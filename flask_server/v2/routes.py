@@ -1,43 +1,140 @@
+import io
 import os
 import json
-from flask import Blueprint, jsonify, request, send_file
-from werkzeug.utils import secure_filename
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
 from flask_server.config import Config
+from flask_common.schema import validate_feed_file, validate_record
+from flask_server.v2.limits import get_admission_control, rate_limit, transfer_slot
+from flask_server.v2.storage import StoredFeed, append_records, replace_feed
 
 # Define the Blueprint for API version v2
 v2 = Blueprint('v2', __name__, url_prefix='/api/v2')
+v2.before_request(rate_limit)
 
-# Set the upload directory path
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../uploads')
 
-# Ensure upload directory exists
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+def upload_path(name: str) -> str:
+    """Returns the path of name in the app's UPLOAD_FOLDER."""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], name)
 
 
 @v2.route('/get/data', methods=['GET'])
+@transfer_slot
 def get_json_data():
-    """Serves the JSON data from a file."""
-    file_path = os.path.join(UPLOAD_FOLDER, Config.JSON_FILE)
-    if os.path.exists(file_path):
+    """Serves the JSON data from a file, with the appended NDJSON records as further items."""
+    file_path = upload_path(Config.JSON_FILE)
+    try:
+        feed = StoredFeed(file_path, upload_path(Config.NDJSON_FILE))
+    except FileNotFoundError:
+        return jsonify({"error": "No data available"}), 404
+    if feed.record_count:
+        # The records are streamed after the feed's items, so the length is not known up front
+        response = Response(feed.iter_document(), mimetype='application/json')
+        response.headers['Content-Disposition'] = f'attachment; filename={Config.JSON_FILE}'
+        response.set_etag(feed.etag)
+        response.call_on_close(feed.close)
+        return response.make_conditional(request)
+    feed.close()
+
+    if current_app.config['USE_X_SENDFILE']:
         return send_file(file_path, as_attachment=True)
-    else:
+
+    # Open first and describe that open file: send_file(path) stats and opens the path separately,
+    # so an upload replacing the file in between would produce a wrong Content-Length
+    try:
+        f = open(file_path, 'rb')
+    except FileNotFoundError:
+        return jsonify({"error": "No data available"}), 404
+    stat = os.fstat(f.fileno())
+    response = send_file(f, as_attachment=True, download_name=Config.JSON_FILE, mimetype='application/json',
+                         etag=f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}",
+                         last_modified=stat.st_mtime, conditional=False)
+    response.content_length = stat.st_size
+    return response.make_conditional(request, accept_ranges=True, complete_length=stat.st_size)
+
+
+@v2.route('/get/data/items', methods=['GET'])
+@transfer_slot
+def get_json_items():
+    """Serves items[offset:offset + limit] of the stored JSON data and NDJSON records from memory-mapped views."""
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    if offset < 0 or not 1 <= limit <= Config.SLICE_MAX_ITEMS:
+        return jsonify({"error": f"offset must be >= 0 and limit between 1 and {Config.SLICE_MAX_ITEMS}"}), 400
+
+    try:
+        feed = StoredFeed(upload_path(Config.JSON_FILE), upload_path(Config.NDJSON_FILE))
+    except FileNotFoundError:
         return jsonify({"error": "No data available"}), 404
+    try:
+        count = feed.count
+    except BaseException:
+        feed.close()
+        raise
+
+    start = min(offset, count)
+    stop = min(offset + limit, count)
+    response = Response(feed.iter_slice(start, stop), mimetype='application/json')
+    response.call_on_close(feed.close)
+    return response
+
+
+def append_ndjson_data():
+    """Appends the newline-delimited items of one request to the NDJSON store.
+
+    Each line must be an item of the feed schema. The records are served after the items of the stored
+    feed until a new feed is uploaded.
+    """
+    records = []
+    for line_number, line in enumerate(request.stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return jsonify({"error": f"Invalid JSON on line {line_number}"}), 400
+        errors = validate_record(record)
+        if errors:
+            return jsonify({"error": f"Invalid record on line {line_number}: {errors[0]}"}), 400
+        records.append(line)
+
+    # The chunk is validated as a whole first, so a rejected chunk never leaves partial records behind
+    if records:
+        append_records(upload_path(Config.NDJSON_FILE), records)
+    return jsonify({"message": "NDJSON records appended successfully", "records": len(records)}), 200
 
 
 @v2.route('/add/data', methods=['POST'])
+@transfer_slot
 def add_json_data():
-    """Handles JSON data upload via direct POST or file attachment."""
+    """Handles JSON data upload via direct POST, file attachment or NDJSON stream."""
+    if request.mimetype == 'application/x-ndjson':
+        return append_ndjson_data()
     if 'file' in request.files:
         file = request.files['file']
         if file.filename.endswith('.json'):
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(UPLOAD_FOLDER, filename))
+            try:
+                validate_feed_file(file.stream, fail_fast=True)
+            except ValueError as e:
+                # Covers both undecodable JSON and SchemaError
+                return jsonify({"error": f"Invalid feed: {e}"}), 400
+            # A validated feed file replaces the stored feed, whatever its name, so that it is what /get/data serves
+            file.stream.seek(0)
+            replace_feed(upload_path(Config.JSON_FILE), upload_path(Config.NDJSON_FILE), file.save)
             return jsonify({"message": "File uploaded successfully"}), 200
     elif request.is_json:
-        json_data = request.get_json()
-        file_path = os.path.join(UPLOAD_FOLDER, Config.JSON_FILE)
-        with open(file_path, 'w') as f:
-            json.dump(json_data, f)
+        # The body is validated item by item and stored as sent, it is never decoded as a whole
+        body = request.get_data()
+        try:
+            validate_feed_file(io.BytesIO(body), fail_fast=True)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid feed: {e}"}), 400
+        replace_feed(upload_path(Config.JSON_FILE), upload_path(Config.NDJSON_FILE), lambda f: f.write(body))
         return jsonify({"message": "JSON data saved successfully"}), 200
     return jsonify({"error": "Invalid data format"}), 400
+
+
+@v2.route('/stats', methods=['GET'])
+def get_stats():
+    """Reports transfer queue depth and rejection counts."""
+    return jsonify(get_admission_control().stats()), 200
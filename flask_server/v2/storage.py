@@ -0,0 +1,335 @@
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import chain
+from typing import Iterator, List, Optional, Tuple
+from filelock import FileLock
+from flask_common.feed import FeedReader
+
+# Tokens that matter for locating items: whole strings (so brackets inside them are skipped) and brackets
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}]', re.DOTALL)
+
+# Bytes of item data collected before a chunk is handed to the WSGI server
+SLICE_CHUNK_BYTES = 64 * 1024
+
+# Versions of the stored file whose item index is kept, the oldest is dropped first
+MAX_INDEXED_VERSIONS = 4
+
+
+class _IndexEntry:
+    """The item index of one version of a file, built by the first request that needs it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.offsets = None
+
+
+class _RecordEntry:
+    """The line offsets of one NDJSON store, extended by the lines appended since the last request."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.offsets = array('Q')
+        self.seq_updates = []  # Highest seqUpdate among the records up to each one
+        self.size = 0
+
+
+_index_cache = {}
+_record_cache = {}
+_index_lock = threading.Lock()
+
+
+def save_atomically(path: str, write, mode: str = 'wb', replace=os.replace):
+    """Writes a file through write(f) into a temporary file and renames it over path with replace.
+
+    Readers that still have the old file open or memory-mapped keep a consistent view of it,
+    instead of seeing it truncated (which would crash a memory-mapped reader with SIGBUS).
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600, a front server serving X-Sendfile must read it
+        replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def index_items(buffer) -> array:
+    """Returns the start/end byte offsets of each object in the top-level "items" array.
+
+    The offsets are stored flat ([start0, end0, start1, end1, ...]) to keep the index compact.
+    """
+    offsets = array('Q')
+    depth = 0
+    key = None
+    in_items = False
+    start = None
+    for match in _TOKEN.finditer(buffer):
+        token = match.group()
+        if token[0] == 0x22:  # '"'
+            if depth == 1:
+                key = token
+        elif token in (b'{', b'['):
+            if depth == 1 and token == b'[':
+                in_items = key == b'"items"'
+            elif depth == 2 and in_items and token == b'{':
+                start = match.start()
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 2 and in_items and token == b'}':
+                offsets.append(start)
+                offsets.append(match.end())
+            elif depth == 1:
+                in_items = False
+    return offsets
+
+
+def open_item_view(path: str):
+    """Opens the stored file and maps it read-only; returns (file, view).
+
+    Index and slices are both taken from this one open file, so they describe the same bytes even if
+    an upload replaces the path in between. An empty file cannot be mapped and gets an empty view.
+    """
+    f = open(path, 'rb')
+    try:
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+    except BaseException:
+        f.close()
+        raise
+    return f, view
+
+
+def close_item_view(f, view):
+    """Closes what open_item_view returned."""
+    if isinstance(view, mmap.mmap):
+        view.close()
+    f.close()
+
+
+def _file_version(f) -> tuple:
+    stat = os.fstat(f.fileno())
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _cache_entry(cache: dict, key, factory):
+    """Returns the entry for key in cache, created by factory; the least recently used entries are dropped."""
+    with _index_lock:
+        entry = cache.pop(key, None) or factory()
+        cache[key] = entry  # Reinserted to mark it as the most recently used
+        while len(cache) > MAX_INDEXED_VERSIONS:
+            del cache[next(iter(cache))]
+    return entry
+
+
+def get_item_index(f, view) -> array:
+    """Returns the item offsets of the open file f with view as its contents, built once per file version.
+
+    The version is what fstat reports for f, not for the path, so the index always matches the view.
+    Concurrent requests for a version whose index is being built wait for that build.
+    """
+    entry = _cache_entry(_index_cache, _file_version(f), _IndexEntry)
+    with entry.lock:
+        if entry.offsets is None:
+            entry.offsets = index_items(view)
+    return entry.offsets
+
+
+def get_record_index(feed_version: Optional[tuple], f, view) -> Tuple[array, int, Optional[int]]:
+    """Returns the line offsets of the NDJSON store f with view as its contents, the number of records
+    in view and their highest seqUpdate.
+
+    The store is only ever appended to, so its index is extended by the new lines instead of being
+    rebuilt. The store is removed whenever the feed is replaced, and the feed version is part of the
+    key so that a new store reusing the inode does not inherit the index of the old one.
+    """
+    stat = os.fstat(f.fileno())
+    entry = _cache_entry(_record_cache, (feed_version, stat.st_dev, stat.st_ino), _RecordEntry)
+    with entry.lock:
+        position = entry.size
+        while position < len(view):
+            end = view.find(b'\n', position)
+            if end < 0:
+                end = len(view)
+            if end > position:
+                seq_update = json.loads(view[position:end]).get('seqUpdate')
+                highest = entry.seq_updates[-1] if entry.seq_updates else None
+                if highest is not None and (seq_update is None or highest > seq_update):
+                    seq_update = highest
+                entry.seq_updates.append(seq_update)
+                entry.offsets.append(position)
+                entry.offsets.append(end)
+            position = end + 1
+        entry.size = max(entry.size, position)
+        # The offsets are ascending, so this counts the records that end within view
+        count = bisect_right(entry.offsets, len(view)) // 2
+        return entry.offsets, count, entry.seq_updates[count - 1] if count else None
+
+
+def _chunked(parts: Iterator[bytes]) -> Iterator[bytes]:
+    """Joins parts into chunks of about SLICE_CHUNK_BYTES for the WSGI server."""
+    chunk = []
+    size = 0
+    for part in parts:
+        chunk.append(part)
+        size += len(part)
+        if size >= SLICE_CHUNK_BYTES:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b''.join(chunk)
+
+
+def _open_view(path: str):
+    """open_item_view, with (None, b'') for a missing file."""
+    try:
+        return open_item_view(path)
+    except FileNotFoundError:
+        return None, b''
+
+
+class StoredFeed:
+    """The stored feed and the NDJSON records appended to it, opened together as one snapshot.
+
+    Both files are opened under the lock append_records and replace_feed take, so the records are
+    always those appended to this version of the feed. Both are served straight out of their
+    memory-mapped views, the feed's items followed by the records; nothing is rewritten to combine them.
+    Raises FileNotFoundError if neither file exists.
+    """
+
+    def __init__(self, feed_path: str, records_path: str):
+        self.file = self.records_file = None
+        self.view = self.records_view = b''
+        self.records, self.record_count, self.seq_update = array('Q'), 0, None
+        self._offsets = None
+        try:
+            with FileLock(records_path + '.lock'):
+                self.file, self.view = _open_view(feed_path)
+                self.records_file, self.records_view = _open_view(records_path)
+            if self.file is None and self.records_file is None:
+                raise FileNotFoundError(feed_path)
+            if self.records_file is not None:
+                feed_version = _file_version(self.file) if self.file is not None else None
+                self.records, self.record_count, self.seq_update = get_record_index(
+                    feed_version, self.records_file, self.records_view)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def offsets(self) -> array:
+        """Item offsets of the feed, indexed on first use since a whole-file download does not need them."""
+        if self._offsets is None:
+            self._offsets = get_item_index(self.file, self.view) if self.file is not None else array('Q')
+        return self._offsets
+
+    @property
+    def count(self) -> int:
+        return len(self.offsets) // 2 + self.record_count
+
+    @property
+    def etag(self) -> str:
+        parts = []
+        if self.file is not None:
+            stat = os.fstat(self.file.fileno())
+            parts.append(f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}")
+        if self.record_count:
+            # The store only grows, its size in this snapshot identifies the records served
+            parts.append(f"{os.fstat(self.records_file.fileno()).st_ino}-{len(self.records_view)}")
+        return '-'.join(parts)
+
+    def close(self):
+        for f, view in ((self.file, self.view), (self.records_file, self.records_view)):
+            if f is not None:
+                close_item_view(f, view)
+
+    def _item(self, index: int) -> bytes:
+        feed_count = len(self.offsets) // 2
+        if index < feed_count:
+            return self.view[self.offsets[2 * index]:self.offsets[2 * index + 1]]
+        index -= feed_count
+        return self.records_view[self.records[2 * index]:self.records[2 * index + 1]]
+
+    def _iter_items(self, start: int, stop: int) -> Iterator[bytes]:
+        for index in range(start, stop):
+            if index > start:
+                yield b', '
+            yield self._item(index)
+
+    def iter_slice(self, start: int, stop: int) -> Iterator[bytes]:
+        """Yields a JSON document with items[start:stop], copied straight out of the memory-mapped views.
+
+        The files are mapped read-only, so every process serving them shares the page cache instead of
+        holding its own copy, and only one chunk per response is in Python memory at a time.
+        """
+        head = f'{{"count": {self.count}, "offset": {start}, "items": ['.encode('utf-8')
+        return _chunked(chain([head], self._iter_items(start, stop), [b']}']))
+
+    def iter_document(self) -> Iterator[bytes]:
+        """Yields the feed with the records after its items, and count and seqUpdate covering them.
+
+        The feed's items are copied as one span of raw bytes out of the mapped file. The other
+        top-level fields of the feed go after the items array.
+        """
+        header = self._header()
+        offsets = self.offsets
+        feed_count = len(offsets) // 2
+        yield b'{"items": ['
+        if feed_count:
+            for position in range(offsets[0], offsets[-1], SLICE_CHUNK_BYTES):
+                yield self.view[position:min(position + SLICE_CHUNK_BYTES, offsets[-1])]
+            if self.record_count:
+                yield b', '
+        yield from _chunked(self._iter_items(feed_count, self.count))
+        yield b']' + b''.join(f', {json.dumps(key)}: {json.dumps(value)}'.encode('utf-8')
+                              for key, value in header.items()) + b'}'
+
+    def _header(self) -> dict:
+        """Returns the top-level fields of the feed other than items, with count and seqUpdate updated."""
+        header = {}
+        if self.file is not None:
+            reader = FeedReader(self.file)
+            if reader.open_items():
+                # The fields after the items array, read from the end of the last item
+                tail = FeedReader(self.file, self.offsets[-1] if self.offsets else reader.offset)
+                tail.close_items()
+                header = dict(reader.header, **tail.header)
+            else:
+                header = reader.header
+        header['count'] = self.count
+        seq_update = header.get('seqUpdate')
+        if self.seq_update is not None and (seq_update is None or self.seq_update > seq_update):
+            header['seqUpdate'] = self.seq_update
+        return header
+
+
+def append_records(path: str, records: List[bytes]):
+    """Appends NDJSON records to the store at path, under the lock StoredFeed and replace_feed take."""
+    with FileLock(path + '.lock'):
+        with open(path, 'ab') as f:
+            f.write(b'\n'.join(records) + b'\n')
+
+
+def replace_feed(feed_path: str, records_path: str, write):
+    """Stores a new feed through write(f) and drops the NDJSON records appended to the one it replaces.
+
+    The new feed is written to a temporary file first; only the rename and the removal of the records
+    run under the lock, so a reader sees either the old feed with its records or the new one alone.
+    Readers that already have the old files open keep serving them.
+    """
+    def replace(tmp_path, path):
+        with FileLock(records_path + '.lock'):
+            os.replace(tmp_path, path)
+            try:
+                os.remove(records_path)
+            except FileNotFoundError:
+                pass
+    save_atomically(feed_path, write, replace=replace)
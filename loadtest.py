@@ -0,0 +1,370 @@
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import click
+import requests
+from werkzeug.serving import make_server
+from flask_client.services import get_json_data, send_ndjson_data, send_post_data
+from flask_server.routes import create_app
+
+# Setup logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'example.json')
+
+# Relative weights of the request types sent by each simulated client
+DEFAULT_MIX = "get=5,items=3,post=1,ndjson=1"
+
+# Rate limits used unless --rate-limit is given, so the harness measures the server and not the limiter
+UNLIMITED_RATE = {"RATE_LIMIT_PER_SECOND": 1_000_000, "RATE_LIMIT_BURST": 1_000_000}
+
+
+class LatencyHistogram:
+    """Counts latencies in log-spaced buckets, so memory stays fixed however long a soak test runs.
+
+    Bucket bounds grow by PRECISION (1%) from MIN_LATENCY up to MAX_LATENCY, and a percentile is
+    reported as the upper bound of the bucket holding its rank, i.e. at most 1% above the exact value.
+    """
+
+    MIN_LATENCY = 1e-5  # Seconds, smaller latencies are counted in the first bucket
+    MAX_LATENCY = 3600.0  # Seconds, larger latencies are counted in the last bucket
+    PRECISION = 0.01
+
+    def __init__(self):
+        self.log_growth = math.log1p(self.PRECISION)
+        self.counts = [0] * (self._bucket(self.MAX_LATENCY) + 1)
+        self.count = 0
+        self.max = 0.0
+
+    def _bucket(self, latency: float) -> int:
+        if latency <= self.MIN_LATENCY:
+            return 0
+        return math.ceil(math.log(latency / self.MIN_LATENCY) / self.log_growth)
+
+    def add(self, latency: float):
+        self.counts[min(self._bucket(latency), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.max = max(self.max, latency)
+
+    def percentile(self, q: float) -> float:
+        """Returns the q-th percentile (0-100) by nearest rank, to within PRECISION."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                if bucket == len(self.counts) - 1:
+                    return self.max  # The last bucket has no upper bound of its own
+                # The slowest request is known exactly and bounds every bucket
+                return min(self.MIN_LATENCY * math.exp(bucket * self.log_growth), self.max)
+        return self.max
+
+
+class EndpointStats:
+    """Latency histogram and error count of one request type, shared by all client threads."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = LatencyHistogram()
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    @property
+    def requests(self) -> int:
+        return self.latencies.count
+
+    def record(self, latency: float, ok: bool):
+        with self.lock:
+            self.latencies.add(latency)
+            if not ok:
+                self.errors += 1
+
+    def summary(self, duration: float) -> dict:
+        with self.lock:
+            count = self.latencies.count
+            errors = self.errors
+            p50, p95, p99 = (self.latencies.percentile(q) for q in (50, 95, 99))
+        return {
+            "endpoint": self.name,
+            "requests": count,
+            "errors": errors,
+            "error_rate": errors / count if count else 0.0,
+            "throughput": count / duration if duration else 0.0,
+            "p50_ms": p50 * 1000,
+            "p95_ms": p95 * 1000,
+            "p99_ms": p99 * 1000,
+        }
+
+
+def read_rss(pid: int) -> int:
+    """Returns the resident set size of a process in bytes, read from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_app(upload_dir: str, server_config: dict):
+    """Creates the server app storing uploads in upload_dir instead of flask_server/uploads."""
+    app = create_app()
+    app.config.update(DEBUG=False, UPLOAD_FOLDER=upload_dir, **server_config)
+    return app
+
+
+class InProcessServer:
+    """Runs the app in a thread of this process with werkzeug's threaded server."""
+
+    # The server shares its process with the load clients, so its memory cannot be told apart from theirs
+    rss_label = "process RSS (server and clients combined)"
+
+    def __init__(self, upload_dir: str, server_config: dict):
+        self.server = make_server("127.0.0.1", 0, build_app(upload_dir, server_config), threaded=True)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+class SubprocessServer:
+    """Runs the app in a separate process (`loadtest.py serve`), so clients and server don't share a GIL."""
+
+    rss_label = "server RSS"
+
+    def __init__(self, upload_dir: str, server_config: dict):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.command = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(self.port),
+                        "--upload-dir", upload_dir, "--server-config", json.dumps(server_config)]
+        self.process = None
+        self.pid = None
+
+    def start(self, timeout: float = 10.0):
+        self.process = subprocess.Popen(self.command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.pid = self.process.pid
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                requests.get(f"{self.base_url}/api/v2/stats", timeout=1)
+                return
+            except requests.exceptions.ConnectionError:
+                if self.process.poll() is not None:
+                    break
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError("Server subprocess did not start")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+
+
+def parse_mix(mix: str) -> dict:
+    """Parses "get=5,post=1" into {"get": 5, "post": 1}."""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = int(weight)
+    return weights
+
+
+def build_scenarios(base_url: str, workdir: str, mix: dict) -> list:
+    """Returns (name, weight, request function) tuples; each function returns whether the request succeeded."""
+    api_url = f"{base_url}/api/v2"
+    with open(EXAMPLE_FILE) as f:
+        feed = json.load(f)
+    ndjson_file = os.path.join(workdir, "records.jsonl")
+    with open(ndjson_file, "w") as f:
+        for item in feed["items"]:
+            f.write(json.dumps(item) + "\n")
+
+    def get_data(rng):
+        return get_json_data(f"{api_url}/get/data") is not None
+
+    def get_items(rng):
+        offset = rng.randrange(max(1, len(feed["items"])))
+        return get_json_data(f"{api_url}/get/data/items?offset={offset}&limit=10") is not None
+
+    def post_json(rng):
+        status_code, _ = send_post_data(f"{api_url}/add/data", data=feed)
+        return status_code == 200
+
+    def post_ndjson(rng):
+        succeeded, _ = send_ndjson_data(f"{api_url}/add/data", ndjson_file, chunk_size=100)
+        return succeeded
+
+    scenarios = {
+        "GET /get/data": ("get", get_data),
+        "GET /get/data/items": ("items", get_items),
+        "POST /add/data json": ("post", post_json),
+        "POST /add/data ndjson": ("ndjson", post_ndjson),
+    }
+    unknown = set(mix) - {key for key, _ in scenarios.values()}
+    if unknown:
+        raise ValueError(f"Unknown request types in mix: {', '.join(sorted(unknown))}")
+    return [(name, mix[key], request) for name, (key, request) in scenarios.items() if mix.get(key)]
+
+
+def run_load(scenarios: list, clients: int, duration: float, pid: int = None,
+             sample_interval: float = 10.0, seed: int = 0):
+    """Drives the scenarios from `clients` threads for `duration` seconds.
+
+    Returns the per-endpoint stats and the periodic samples (elapsed seconds, requests so far, server RSS).
+    """
+    stats = {name: EndpointStats(name) for name, _, _ in scenarios}
+    names = [name for name, _, _ in scenarios]
+    weights = [weight for _, weight, _ in scenarios]
+    requests_by_name = {name: request for name, _, request in scenarios}
+    start = time.monotonic()
+    deadline = start + duration
+    stop = threading.Event()
+
+    def client(index):
+        rng = random.Random(seed + index)
+        while not stop.is_set() and time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            began = time.perf_counter()
+            try:
+                ok = requests_by_name[name](rng)
+            except Exception:
+                ok = False
+            stats[name].record(time.perf_counter() - began, ok)
+
+    threads = [threading.Thread(target=client, args=(index,), daemon=True) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+
+    def sample():
+        total = sum(endpoint.requests for endpoint in stats.values())
+        return time.monotonic() - start, total, read_rss(pid) if pid else 0
+
+    samples = [sample()]
+    next_sample = start + sample_interval
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.1)
+            if time.monotonic() >= next_sample:
+                samples.append(sample())
+                next_sample += sample_interval
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    samples.append(sample())
+    return stats, samples
+
+
+def format_report(stats: dict, samples: list, duration: float, rss_label: str = "server RSS") -> str:
+    lines = [f"{'endpoint':<24}{'requests':>10}{'errors':>8}{'err %':>8}{'req/s':>10}"
+             f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for endpoint in stats.values():
+        row = endpoint.summary(duration)
+        lines.append(f"{row['endpoint']:<24}{row['requests']:>10}{row['errors']:>8}{row['error_rate'] * 100:>8.2f}"
+                     f"{row['throughput']:>10.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+
+    rss = [sample[2] for sample in samples if sample[2]]
+    if rss:
+        lines.append("")
+        lines.append(f"{rss_label}: start {rss[0] / 2**20:.1f} MiB, end {rss[-1] / 2**20:.1f} MiB, "
+                     f"max {max(rss) / 2**20:.1f} MiB, growth {(rss[-1] - rss[0]) / 2**20:+.1f} MiB")
+    return "\n".join(lines)
+
+
+@click.group()
+def cli():
+    """Load and soak tests for the client-server pair, run entirely on this host."""
+    pass
+
+
+@cli.command('run')
+@click.option('--clients', '-c', type=click.IntRange(min=1), default=8, show_default=True,
+              help='Number of concurrent simulated clients')
+@click.option('--duration', '-d', type=click.FloatRange(min=0), default=30, show_default=True,
+              help='Test length in seconds; use hours for a soak test')
+@click.option('--mix', default=DEFAULT_MIX, show_default=True, help='Relative weights of the request types')
+@click.option('--mode', type=click.Choice(['inprocess', 'subprocess']), default='subprocess', show_default=True,
+              help='Run the server in a thread of this process or in its own process')
+@click.option('--sample-interval', type=click.FloatRange(min=0.1), default=10, show_default=True,
+              help='Seconds between throughput and server memory samples')
+@click.option('--rate-limit/--no-rate-limit', default=False, show_default=True,
+              help='Keep the server rate limits from flask_server.config; all clients share one bucket')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed for the request sequence')
+@click.option('--json-output', type=click.Path(dir_okay=False), help='Also write the report as JSON to this file')
+def run(clients, duration, mix, mode, sample_interval, rate_limit, seed, json_output):
+    """Start a local server and drive mixed GET/POST traffic against it."""
+    # Failed requests are counted in the report, per-request logs would only flood the output
+    logging.getLogger('flask_client.services').setLevel(logging.CRITICAL)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    upload_dir = os.path.join(workdir, "uploads")
+    os.makedirs(upload_dir)
+    shutil.copy(EXAMPLE_FILE, os.path.join(upload_dir, "example.json"))
+
+    server_class = InProcessServer if mode == 'inprocess' else SubprocessServer
+    server = server_class(upload_dir, {} if rate_limit else UNLIMITED_RATE)
+    server.start()
+    try:
+        scenarios = build_scenarios(server.base_url, workdir, parse_mix(mix))
+        logger.info(f"Running {clients} clients for {duration:g}s against {server.base_url} ({mode})...")
+        stats, samples = run_load(scenarios, clients, duration, pid=server.pid,
+                                  sample_interval=sample_interval, seed=seed)
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    elapsed = samples[-1][0]
+    click.echo(format_report(stats, samples, elapsed, server.rss_label))
+    if json_output:
+        with open(json_output, "w") as f:
+            json.dump({
+                "clients": clients,
+                "duration": elapsed,
+                "mode": mode,
+                "rss": server.rss_label,
+                "endpoints": [endpoint.summary(elapsed) for endpoint in stats.values()],
+                "samples": [{"elapsed": t, "requests": n, "rss": rss} for t, n, rss in samples],
+            }, f, indent=2)
+
+
+@cli.command('serve')
+@click.option('--port', type=int, required=True)
+@click.option('--upload-dir', type=click.Path(file_okay=False), required=True)
+@click.option('--server-config', default='{}', help='JSON object merged into the app config')
+def serve(port, upload_dir, server_config):
+    """Run the server for `run --mode subprocess` (not meant to be called directly)."""
+    app = build_app(upload_dir, json.loads(server_config))
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+if __name__ == "__main__":
+    cli()
@@ -4,8 +4,9 @@ import requests_mock
 from unittest.mock import patch
 from client import cli, fetch_and_store_data, post_data, save_to_database
 from flask_client.parser import DataParser
-from flask_client.models import Base, ItemModel, IndicatorModel
-from sqlalchemy import create_engine
+from flask_client.services import send_ndjson_data
+from flask_client.models import Base, ItemModel, IndicatorModel, add_missing_columns
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 
 
@@ -145,6 +146,41 @@ def test_post_file(requests_mock_fixture, tmp_path):
     assert b'{"key": "file_data"}' in multipart_body  # Check the file content within the multipart body
 
 
+# Test POST NDJSON functionality in chunks with mocked server responses
+def test_post_ndjson(requests_mock_fixture, tmp_path):
+    """Test the client streaming an NDJSON file in chunks."""
+    test_file = tmp_path / "test.jsonl"
+    test_file.write_text('{"id": "item1"}\n{"id": "item2"}\n\n{"id": "item3"}\n{"id": "item4"}\n{"id": "item5"}')
+
+    server_url = f"{SERVER_URL}/api/{API_VERSION}/add/data"
+    requests_mock_fixture.post(server_url, [{"json": {"records": 2}, "status_code": 200},
+                                            {"json": {"records": 2}, "status_code": 200},
+                                            {"json": {"records": 1}, "status_code": 200}])
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ['post', '--ndjson', str(test_file), '--chunk-size', '2'])
+
+    assert result.exit_code == 0
+    assert requests_mock_fixture.call_count == 3
+    assert requests_mock_fixture.last_request.headers["Content-Type"] == "application/x-ndjson"
+
+
+# Test that an interrupted NDJSON upload reports where to resume
+def test_send_ndjson_data_resume(requests_mock_fixture, tmp_path):
+    """Test send_ndjson_data acknowledgements on failure and resume."""
+    test_file = tmp_path / "test.jsonl"
+    test_file.write_text('{"id": "item1"}\n{"id": "item2"}\n{"id": "item3"}\n')
+
+    server_url = f"{SERVER_URL}/api/{API_VERSION}/add/data"
+    requests_mock_fixture.post(server_url, [{"json": {"records": 2}, "status_code": 200},
+                                            {"json": {"error": "Server error"}, "status_code": 500}])
+    assert send_ndjson_data(server_url, str(test_file), chunk_size=2) == (False, 2)
+
+    requests_mock_fixture.post(server_url, json={"records": 1}, status_code=200)
+    assert send_ndjson_data(server_url, str(test_file), chunk_size=2, skip=2) == (True, 3)
+    assert requests_mock_fixture.call_count == 3
+
+
 # Test save_to_database function with edge cases including incomplete indicator data
 def test_save_to_database_with_incomplete_indicators(db_session):
     """Test save_to_database with incomplete indicator data."""
@@ -240,6 +276,101 @@ def test_save_to_database_with_incomplete_item(db_session):
     assert len(indicators) == 0  # No indicators should be present
 
 
+# Test that re-ingesting an item that is not newer than the stored one is skipped
+def test_save_to_database_skips_stale_items(db_session):
+    """Test save_to_database with an incoming seqUpdate older than the stored one."""
+
+    def feed(seq_update, author):
+        return {
+            "count": 1,
+            "items": [{"id": "item4", "author": author, "indicators": [{"id": "ind4", "domain": author}],
+                       "seqUpdate": seq_update}],
+            "seqUpdate": seq_update
+        }
+
+    save_to_database(DataParser(feed(200, "fresh")), db_session)
+    stats = save_to_database(DataParser(feed(100, "stale")), db_session)
+
+    assert stats.stale_items == 1
+    item = db_session.query(ItemModel).filter_by(id="item4").first()
+    assert item.author == "fresh"
+    assert item.seq_update == 200
+    assert db_session.query(IndicatorModel).filter_by(id="ind4").first().domain == "fresh"
+
+    stats = save_to_database(DataParser(feed(300, "newer")), db_session)
+    assert stats.stale_items == 0
+    assert db_session.query(ItemModel).filter_by(id="item4").first().author == "newer"
+    assert db_session.query(IndicatorModel).filter_by(id="ind4").first().domain == "newer"
+
+
+# Test that re-ingesting unchanged content under a newer seqUpdate writes nothing
+def test_save_to_database_skips_unchanged_rows(db_session):
+    """Test save_to_database with matching item and indicator fingerprints."""
+
+    def feed(seq_update, domain):
+        return {
+            "count": 1,
+            "items": [{"id": "item5", "author": "Author5", "labels": ["label5"],
+                       "indicators": [{"id": "ind5", "domain": domain}], "seqUpdate": seq_update}],
+            "seqUpdate": seq_update
+        }
+
+    save_to_database(DataParser(feed(100, "example5.com")), db_session)
+    stats = save_to_database(DataParser(feed(200, "example5.com")), db_session)
+    assert stats.unchanged_items == 1
+    assert stats.unchanged_indicators == 1
+
+    stats = save_to_database(DataParser(feed(300, "changed5.com")), db_session)
+    assert stats.unchanged_items == 1
+    assert stats.unchanged_indicators == 0
+    assert db_session.query(IndicatorModel).filter_by(id="ind5").first().domain == "changed5.com"
+
+
+# Test that an unchanged item still records its newer seqUpdate, so an older copy cannot win afterwards
+def test_save_to_database_unchanged_item_bumps_seq_update(db_session):
+    """Test save_to_database with seqUpdate 100 -> 200 (same content) -> 150 (different content)."""
+
+    def feed(seq_update, author):
+        return {"count": 1, "items": [{"id": "item6", "author": author, "seqUpdate": seq_update}]}
+
+    save_to_database(DataParser(feed(100, "A")), db_session)
+    stats = save_to_database(DataParser(feed(200, "A")), db_session)
+    assert stats.unchanged_items == 1
+    assert db_session.query(ItemModel).filter_by(id="item6").first().seq_update == 200
+
+    stats = save_to_database(DataParser(feed(150, "OLD")), db_session)
+    assert stats.stale_items == 1
+    item = db_session.query(ItemModel).filter_by(id="item6").first()
+    assert (item.author, item.seq_update) == ("A", 200)
+
+
+# Test that a database created before the fingerprint columns existed is upgraded in place
+def test_add_missing_columns(tmp_path):
+    """Test add_missing_columns on tables without the fingerprint columns."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id VARCHAR PRIMARY KEY, author VARCHAR, company_ids JSON, "
+                                "indicator_ids JSON, is_published BOOLEAN, is_tailored BOOLEAN, labels JSON, "
+                                "langs JSON, seq_update INTEGER, malware_list JSON)"))
+        connection.execute(text("CREATE TABLE indicators (id VARCHAR PRIMARY KEY, date_first_seen VARCHAR, "
+                                "date_last_seen VARCHAR, deleted BOOLEAN, description VARCHAR, domain VARCHAR, "
+                                "item_id VARCHAR NOT NULL REFERENCES items (id))"))
+        connection.execute(text("INSERT INTO items (id, author, seq_update) VALUES ('item7', 'Author7', 100)"))
+
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+    add_missing_columns(engine)  # Nothing left to add
+    assert 'fingerprint' in {column['name'] for column in inspect(engine).get_columns('items')}
+    assert 'fingerprint' in {column['name'] for column in inspect(engine).get_columns('indicators')}
+
+    session = sessionmaker(bind=engine)()
+    json_data = {"items": [{"id": "item7", "author": "Author7", "indicators": [{"id": "ind7"}], "seqUpdate": 200}]}
+    stats = save_to_database(DataParser(json_data), session)
+    assert stats.unchanged_items == 0  # The stored row had no fingerprint yet, so it is rewritten once
+    assert session.get(ItemModel, "item7").fingerprint == DataParser(json_data).items[0].fingerprint
+    session.close()
+
+
 # Test that invalid JSON data is handled gracefully
 @patch('flask_client.services.get_json_data')
 def test_invalid_json_handling(mock_get_json_data):
@@ -248,4 +379,19 @@ def test_invalid_json_handling(mock_get_json_data):
 
     runner = CliRunner()
     result = runner.invoke(fetch_and_store_data)
-    assert result.exit_code == 0
\ No newline at end of file
+    assert result.exit_code == 0
+
+# Test that cache stats are logged after the whole run, also when the feed is rejected
+def test_cache_stats_logged_last(requests_mock_fixture, tmp_path, monkeypatch, caplog):
+    """Test that the 'get' command logs cache stats after a parse error."""
+    from flask_client.config import Config
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path))
+    requests_mock_fixture.get(f"{SERVER_URL}/api/{API_VERSION}/get/data", content=b'{"items": [',
+                              headers={"Content-Type": "application/json"})
+
+    with caplog.at_level('INFO', logger='client'):
+        result = CliRunner().invoke(cli, ['get'])
+    assert result.exit_code == 0
+    messages = [record.getMessage() for record in caplog.records if record.name == 'client']
+    assert messages[-2].startswith("Error: Invalid feed")
+    assert messages[-1] == "Cache stats: hits: 0, revalidated: 0, misses: 1, evictions: 0"
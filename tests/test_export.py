@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import pytest
+import requests_mock
+from client import save_to_database
+from flask_client.export import iter_feed_items, write_json, write_ndjson, write_parquet
+from flask_client.parser import DataParser
+from flask_client.models import Base
+from flask_client.services import send_post_data
+from flask_server.routes import create_app
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../example.json')
+
+
+# Fixture to setup an in-memory SQLite database filled with example.json
+@pytest.fixture(scope='module')
+def db_session():
+    """Set up an in-memory SQLite database holding the example feed."""
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    with open(EXAMPLE_FILE) as f:
+        save_to_database(DataParser(json.load(f)), session)
+
+    yield session
+
+    session.close()
+    Base.metadata.drop_all(engine)
+
+
+# Test that the JSON export can be parsed back into the same items
+def test_export_json_round_trip(db_session):
+    """Test that write_json produces a feed that DataParser reads back."""
+    stream = io.StringIO()
+    count = write_json(iter_feed_items(db_session, chunk_size=1), stream)
+
+    parser = DataParser(json.loads(stream.getvalue()))
+    assert count == 1
+    assert parser.count == 1
+    assert parser.seq_update == 16172928022293
+
+    item = parser.items[0]
+    assert item.id == "fake4f16300296d20ef9b909dc0d354fb"
+    assert item.malware_list == []
+    assert item.langs == ["en"]
+    assert [ind.id for ind in item.indicators] == ["fakebe483bb82759fbee7038235e0f52d0"]
+    assert item.indicators[0].domain == "fake-fakesop.net"
+
+
+# Test that a JSON export posted with `post --file` is what the receiving server serves
+def test_export_json_replicates(db_session, tmp_path):
+    """Test exporting, uploading the file to a server and reading the feed back from it."""
+    upload_folder = tmp_path / 'uploads'
+    upload_folder.mkdir()
+    app = create_app()
+    app.config['UPLOAD_FOLDER'] = str(upload_folder)
+
+    export_file = tmp_path / 'export.json'
+    with open(export_file, 'w', encoding='utf-8') as f:
+        write_json(iter_feed_items(db_session), f)
+
+    endpoint = 'http://replica/api/v2/add/data'
+    with app.test_client() as client, requests_mock.Mocker() as mocker:
+        def forward(request, context):
+            # Hands the multipart request send_post_data built to the server as it is
+            response = client.post('/api/v2/add/data', data=request.body, content_type=request.headers['Content-Type'])
+            context.status_code = response.status_code
+            return response.json
+        mocker.post(endpoint, json=forward)
+        assert send_post_data(endpoint, file=str(export_file))[0] == 200
+
+        response = client.get('/api/v2/get/data')
+        parser = DataParser(json.loads(response.data))
+        response.close()
+
+    assert parser.seq_update == 16172928022293
+    assert [item.id for item in parser.items] == ["fake4f16300296d20ef9b909dc0d354fb"]
+
+
+# Test NDJSON export and the --since filter
+def test_export_ndjson_since(db_session):
+    """Test that write_ndjson writes one item per line and honours since."""
+    stream = io.StringIO()
+    assert write_ndjson(iter_feed_items(db_session), stream) == 1
+    line = json.loads(stream.getvalue().splitlines()[0])
+    assert line["id"] == "fake4f16300296d20ef9b909dc0d354fb"
+    assert len(line["indicators"]) == 1
+
+    stream = io.StringIO()
+    assert write_ndjson(iter_feed_items(db_session, since=16172928022293), stream) == 0
+    assert stream.getvalue() == ""
+
+
+# Test Parquet export when pyarrow is available
+def test_export_parquet(db_session, tmp_path):
+    """Test that write_parquet writes a readable Parquet file."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "export.parquet"
+    with open(path, 'wb') as f:
+        assert write_parquet(iter_feed_items(db_session), f) == 1
+
+    rows = pq.read_table(path).to_pylist()
+    assert rows[0]["id"] == "fake4f16300296d20ef9b909dc0d354fb"
+    assert rows[0]["indicators"][0]["domain"] == "fake-fakesop.net"
@@ -0,0 +1,94 @@
+import json
+import os
+import io
+import pytest
+from flask_client.ingest import IngestStats, dedup_items, parse_parallel
+from flask_client.parser import DataParser, Item
+from flask_common.schema import SchemaError
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../example.json')
+
+
+# Test that parallel parsing matches single-process parsing, duplicates included
+def test_parse_parallel_matches_single_process():
+    """Test parse_parallel against DataParser on example.json."""
+    with open(EXAMPLE_FILE, 'rb') as f:
+        raw_data = f.read()
+
+    expected = DataParser(json.loads(raw_data))
+    parser = parse_parallel(raw_data, workers=4)
+
+    assert parser.count == expected.count
+    assert parser.seq_update == expected.seq_update
+    assert [item.id for item in parser.items] == [item.id for item in expected.items]
+    assert [item.malware_list for item in parser.items] == [item.malware_list for item in expected.items]
+    assert [item.seq_update for item in parser.items] == [item.seq_update for item in expected.items]
+    assert ([[ind.__dict__ for ind in item.indicators] for item in parser.items] ==
+            [[ind.__dict__ for ind in item.indicators] for item in expected.items])
+
+
+# Test that duplicate items collapse to the copy with the highest seqUpdate
+def test_dedup_items_keeps_highest_seq_update():
+    """Test dedup_items on the duplicate item shipped in example.json."""
+    with open(EXAMPLE_FILE) as f:
+        json_data = json.load(f)
+
+    stats = IngestStats()
+    items = dedup_items(DataParser(json_data).items, stats)
+
+    assert len(items) == 1
+    assert items[0].seq_update == 16172928022293
+    assert items[0].malware_list == []
+    assert len(items[0].indicators) == 1
+    assert stats.duplicate_items == 1
+    assert stats.duplicate_indicators == 0
+
+
+# Test that a shared indicator is kept only under the newest item
+def test_dedup_items_shared_indicator():
+    """Test dedup_items with one indicator listed under two different items."""
+    indicator = {"id": "ind1", "domain": "example1.com"}
+    older = Item({"id": "item1", "indicators": [indicator], "seqUpdate": 2})
+    newer = Item({"id": "item2", "indicators": [indicator], "seqUpdate": 3})
+
+    stats = IngestStats()
+    items = dedup_items([older, newer], stats)
+
+    assert [item.id for item in items] == ["item1", "item2"]
+    assert items[0].indicators == []
+    assert [ind.id for ind in items[1].indicators] == ["ind1"]
+    assert stats.duplicate_indicators == 1
+
+
+# Test that parallel parsing reports the same schema errors as single-process parsing
+def test_parse_parallel_validate():
+    """Test parse_parallel with validation enabled."""
+    json_data = {"items": [{"id": "item%d" % index} for index in range(10)] + [{"id": 10}, {"author": "x"}]}
+
+    expected = DataParser(json_data, validate=True)
+    parser = parse_parallel(json.dumps(json_data).encode('utf-8'), workers=3, validate=True)
+
+    assert [item.id for item in parser.items] == [item.id for item in expected.items]
+    assert [str(error) for error in parser.errors] == [str(error) for error in expected.errors]
+    assert len(parser.errors) == 2
+
+
+# Test byte ranges that start inside an item, where a nested object looks like an item boundary
+def test_parse_parallel_misaligned_ranges():
+    """Test parse_parallel on items with many indicators against DataParser.from_feed."""
+    with open(EXAMPLE_FILE) as f:
+        item = json.load(f)['items'][0]
+    items = [dict(item, id=f"item{index}", indicators=item['indicators'] * (index % 7)) for index in range(50)]
+    items[31]['id'] = 31
+    raw_data = json.dumps({"count": 50, "items": items, "seqUpdate": 9}, indent=2).encode('utf-8')
+
+    expected = DataParser.from_feed(io.BytesIO(raw_data), validate=True)
+    for workers in (2, 5, 16):
+        parser = parse_parallel(raw_data, workers, validate=True)
+        assert [parsed.to_row() for parsed in parser.items] == [parsed.to_row() for parsed in expected.items]
+        assert [str(error) for error in parser.errors] == ["items[31].id: expected string, got int"]
+        assert (parser.count, parser.seq_update) == (50, 9)
+
+    with pytest.raises(SchemaError) as excinfo:
+        parse_parallel(raw_data, 5, validate=True, fail_fast=True)
+    assert excinfo.value.path == "items[31].id"
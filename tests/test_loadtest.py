@@ -0,0 +1,57 @@
+import os
+import shutil
+import pytest
+from loadtest import (EXAMPLE_FILE, UNLIMITED_RATE, InProcessServer, LatencyHistogram, build_scenarios,
+                      format_report, parse_mix, run_load)
+
+
+# Test nearest-rank percentiles from the bounded histogram
+def test_latency_histogram():
+    """Test LatencyHistogram percentiles against exact values and its fixed size."""
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+
+    buckets = len(histogram.counts)
+    for value in range(1, 101):
+        histogram.add(value / 1000)
+    for q in (50, 95, 99):
+        assert q / 1000 <= histogram.percentile(q) <= q / 1000 * (1 + LatencyHistogram.PRECISION)
+    assert histogram.percentile(100) == 0.1
+
+    for _ in range(10000):
+        histogram.add(7200.0)  # Beyond MAX_LATENCY, counted in the last bucket
+    assert len(histogram.counts) == buckets
+    assert histogram.count == 10100
+    assert histogram.percentile(99) == 7200.0
+
+
+# Test that an unknown request type in the mix is rejected
+def test_build_scenarios_unknown_mix(tmp_path):
+    """Test build_scenarios with a request type that does not exist."""
+    with pytest.raises(ValueError):
+        build_scenarios("http://127.0.0.1:1", str(tmp_path), parse_mix("get=1,delete=1"))
+
+
+# Test a short in-process run with mixed traffic
+def test_run_load_in_process(tmp_path):
+    """Test that the harness drives every endpoint against a local server without errors."""
+    upload_dir = tmp_path / "uploads"
+    os.makedirs(upload_dir)
+    shutil.copy(EXAMPLE_FILE, upload_dir / "example.json")
+
+    server = InProcessServer(str(upload_dir), UNLIMITED_RATE)
+    server.start()
+    try:
+        scenarios = build_scenarios(server.base_url, str(tmp_path), parse_mix("get=1,items=1,post=1,ndjson=1"))
+        stats, samples = run_load(scenarios, clients=2, duration=1, pid=server.pid, sample_interval=0.5)
+    finally:
+        server.stop()
+
+    assert set(stats) == {"GET /get/data", "GET /get/data/items", "POST /add/data json", "POST /add/data ndjson"}
+    for endpoint in stats.values():
+        summary = endpoint.summary(samples[-1][0])
+        assert summary["requests"] > 0
+        assert summary["errors"] == 0
+        assert summary["p50_ms"] <= summary["p99_ms"]
+    assert samples[-1][2] > 0  # RSS was sampled
+    assert "process RSS (server and clients combined)" in format_report(stats, samples, 1, server.rss_label)
@@ -1,5 +1,8 @@
+import io
+import json
 import pytest
 from flask_client.parser import DataParser, Item, Indicator
+from flask_common.schema import SchemaError
 
 
 # Test DataParser with valid JSON data
@@ -167,3 +170,46 @@ def test_parser_invalid_structure():
     assert parser.count == 0
     assert len(parser.items) == 0
     assert parser.seq_update == 0
+
+
+# Test that fingerprints follow the content but ignore seqUpdate
+def test_item_fingerprint():
+    """Test Item and Indicator fingerprints."""
+    data = {"id": "item1", "author": "Author1", "labels": ["label1"],
+            "indicators": [{"id": "ind1", "domain": "example1.com"}], "seqUpdate": 1}
+
+    item = Item(data)
+    assert item.fingerprint == Item(dict(data, seqUpdate=2)).fingerprint
+    assert item.fingerprint != Item(dict(data, labels=["label2"])).fingerprint
+    assert item.indicators[0].fingerprint == Indicator({"id": "ind1", "domain": "example1.com"}).fingerprint
+    assert item.indicators[0].fingerprint != Indicator({"id": "ind1", "domain": "example2.com"}).fingerprint
+
+
+# Test DataParser validation skipping invalid items
+def test_parser_validate_skips_invalid_items():
+    """Test that DataParser with validate skips invalid items and records their errors."""
+    json_data = {"items": [{"id": "item1"}, {"id": 2}, {"id": "item3", "langs": "en"}, {"id": "item4"}]}
+
+    parser = DataParser(json_data, validate=True)
+    assert [item.id for item in parser.items] == ["item1", "item4"]
+    assert [error.path for error in parser.errors] == ["items[1].id", "items[2].langs"]
+
+    with pytest.raises(SchemaError):
+        DataParser(json_data, validate=True, fail_fast=True)
+
+
+# Test parsing a feed file item by item
+def test_parser_from_feed():
+    """Test that DataParser.from_feed matches DataParser on the decoded document."""
+    json_data = {"count": 4, "items": [{"id": "item1"}, {"id": 2}, {"id": "itém3", "langs": ["ru"]}],
+                 "seqUpdate": 7}
+    raw = json.dumps(json_data, ensure_ascii=False).encode('utf-8')
+
+    parser = DataParser.from_feed(io.BytesIO(raw), validate=True)
+    expected = DataParser(json_data, validate=True)
+    assert [item.__dict__ for item in parser.items] == [item.__dict__ for item in expected.items]
+    assert [str(error) for error in parser.errors] == [str(error) for error in expected.errors]
+    assert (parser.count, parser.seq_update) == (4, 7)
+
+    with pytest.raises(SchemaError):
+        DataParser.from_feed(io.BytesIO(b'{"items": [{"id": 2}, not json'), validate=True, fail_fast=True)
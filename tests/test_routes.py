@@ -1,14 +1,17 @@
 import pytest
 import os
+import shutil
 from flask_server.routes import create_app
 
 
 # Setup a Flask test client
 @pytest.fixture
-def client():
+def client(tmp_path):
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../example.json'), tmp_path / 'example.json')
+
     app = create_app()
     app.config['TESTING'] = True
-    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../flask_server/uploads')
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
 
     with app.test_client() as client:
         yield client
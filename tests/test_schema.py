@@ -0,0 +1,80 @@
+import io
+import json
+import os
+import pytest
+from flask_common.feed import FeedDecodeError
+from flask_common.schema import SchemaError, validate_feed, validate_feed_file, validate_item
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../example.json')
+
+
+# Test that the shipped example feed is valid
+def test_validate_example_feed():
+    """Test validate_feed with example.json."""
+    with open(EXAMPLE_FILE) as f:
+        assert validate_feed(json.load(f)) == []
+
+
+# Test that nullable fields and missing optional fields are accepted
+def test_validate_item_incomplete():
+    """Test validate_item with null and missing optional fields."""
+    item = {"id": "item3", "companyId": None, "isPublished": None, "labels": None, "seqUpdate": 1617292819999}
+    assert validate_item(item, 0) == []
+
+
+# Test that errors carry the position of the offending value
+def test_validate_item_errors():
+    """Test validate_item error paths and messages."""
+    item = {
+        "id": 1,
+        "indicators": [{"domain": "example1.com"}],
+        "labels": ["label1", 2],
+        "seqUpdate": True
+    }
+    errors = [str(error) for error in validate_item(item, 3)]
+    assert errors == [
+        "items[3].id: expected string, got int",
+        "items[3].indicators[0].id: missing required field",
+        "items[3].labels[1]: expected string, got int",
+        "items[3].seqUpdate: expected integer, got bool",
+    ]
+
+
+# Test fail-fast validation of a whole feed
+def test_validate_feed_fail_fast():
+    """Test that fail_fast raises the first error and stops."""
+    json_data = {"items": [{"id": "item1"}, {"author": "Author2"}, {"id": None}]}
+
+    assert [str(error) for error in validate_feed(json_data)] == [
+        "items[1].id: missing required field",
+        "items[2].id: must not be null",
+    ]
+    with pytest.raises(SchemaError) as excinfo:
+        validate_feed(json_data, fail_fast=True)
+    assert excinfo.value.path == "items[1].id"
+
+
+# Test that a feed that is not an object is rejected
+def test_validate_feed_not_an_object():
+    """Test validate_feed with a top-level list."""
+    errors = validate_feed([{"id": "item1"}])
+    assert len(errors) == 1
+    assert str(errors[0]) == "<root>: expected object, got list"
+
+
+# Test that a feed file is validated item by item while it is decoded
+def test_validate_feed_file_incremental():
+    """Test that validate_feed_file reports an invalid item before decoding the malformed rest of the file."""
+    with open(EXAMPLE_FILE, 'rb') as f:
+        assert validate_feed_file(f) == []
+
+    source = io.BytesIO(b'{"items": [{"id": "item1"}, {"id": 2}, not json')
+    with pytest.raises(SchemaError) as excinfo:
+        validate_feed_file(source, fail_fast=True)
+    assert str(excinfo.value) == "items[1].id: expected string, got int"
+
+    with pytest.raises(FeedDecodeError):
+        validate_feed_file(io.BytesIO(b'{"items": [{"id": "item1"}, {"id": 2}, not json'))
+
+    errors = validate_feed_file(io.BytesIO(b'{"items": [{"id": "item1"}], "count": "1"}'))
+    assert [str(error) for error in errors] == ["count: expected integer, got str"]
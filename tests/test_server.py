@@ -5,14 +5,18 @@ from flask_server.routes import create_app
 
 # Define the path for the JSON file
 DATA_FILE_NAME = 'example.json'
+NDJSON_FILE_NAME = 'data.ndjson'
 
 
 # Setup a Flask test client
 @pytest.fixture
-def client():
+def client(tmp_path):
+    upload_folder = tmp_path / 'uploads'
+    upload_folder.mkdir()
+
     app = create_app()
     app.config['TESTING'] = True
-    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../flask_server/uploads')
+    app.config['UPLOAD_FOLDER'] = str(upload_folder)
 
     with app.test_client() as client:
         yield client
@@ -100,3 +104,223 @@ def test_post_file_upload(client, tmp_path, version):
 
         assert response.status_code == 200
         assert response.json['message'] == "File uploaded successfully"
+
+    # The uploaded file is stored as the feed, whatever its name
+    data_path = os.path.join(client.application.config['UPLOAD_FOLDER'], DATA_FILE_NAME)
+    with open(data_path) as f:
+        assert json.load(f) == {"key": "file_data"}
+
+
+# Fixture to ensure the NDJSON store is empty before and after the test
+@pytest.fixture
+def remove_ndjson(client):
+    """Fixture to delete the NDJSON store if it exists."""
+    data_path = os.path.join(client.application.config['UPLOAD_FOLDER'], NDJSON_FILE_NAME)
+    if os.path.exists(data_path):
+        os.remove(data_path)
+
+    yield data_path
+
+    if os.path.exists(data_path):
+        os.remove(data_path)
+
+
+# Test the POST /api/v2/add/data endpoint with NDJSON chunks
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_post_ndjson_data(client, remove_ndjson, version):
+    """Test that NDJSON chunks are appended to the NDJSON store."""
+    for chunk in (b'{"id": "item1"}\n{"id": "item2"}\n', b'\n{"id": "item3", "seqUpdate": 5}'):
+        response = client.post(f'/api/{version}/add/data', data=chunk, content_type='application/x-ndjson')
+        assert response.status_code == 200
+        assert response.json['message'] == "NDJSON records appended successfully"
+
+    assert response.json['records'] == 1
+    with open(remove_ndjson) as f:
+        assert [json.loads(line) for line in f] == [{"id": "item1"}, {"id": "item2"}, {"id": "item3", "seqUpdate": 5}]
+
+
+# Test that appended NDJSON records are served as items of the stored feed
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_ndjson_records_served_with_feed(client, remove_ndjson, version):
+    """Test that GET /api/v2/get/data and /get/data/items include the NDJSON records."""
+    json_data = {"count": 2, "items": [{"id": "item1"}, {"id": "item2"}], "seqUpdate": 3}
+    response = client.post(f'/api/{version}/add/data', json=json_data)
+    assert response.status_code == 200
+    response.close()
+    response = client.post(f'/api/{version}/add/data', data=b'{"id": "item3", "seqUpdate": 7}\n',
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    response.close()
+
+    response = client.get(f'/api/{version}/get/data/items?offset=1&limit=5')
+    assert response.json == {"count": 3, "offset": 1, "items": [{"id": "item2"}, {"id": "item3", "seqUpdate": 7}]}
+    response.close()
+
+    response = client.post(f'/api/{version}/add/data', data=b'{"id": "item4"}\n', content_type='application/x-ndjson')
+    assert response.status_code == 200
+    response.close()
+    response = client.get(f'/api/{version}/get/data')
+    assert json.loads(response.data) == {
+        "count": 4,
+        "items": [{"id": "item1"}, {"id": "item2"}, {"id": "item3", "seqUpdate": 7}, {"id": "item4"}],
+        "seqUpdate": 7
+    }
+    etag = response.headers['ETag']
+    response.close()
+
+    # Reads leave both stored files as they are
+    data_path = os.path.join(client.application.config['UPLOAD_FOLDER'], DATA_FILE_NAME)
+    with open(data_path) as f:
+        assert json.load(f) == json_data
+    assert os.path.exists(remove_ndjson)
+    response = client.get(f'/api/{version}/get/data', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    response.close()
+
+    # A new feed replaces the records appended to the old one
+    response = client.post(f'/api/{version}/add/data', json={"items": [{"id": "new"}]})
+    assert response.status_code == 200
+    response.close()
+    assert not os.path.exists(remove_ndjson)
+    response = client.get(f'/api/{version}/get/data/items')
+    assert response.json == {"count": 1, "offset": 0, "items": [{"id": "new"}]}
+    response.close()
+
+
+# Test that a chunk with an invalid line is rejected as a whole
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_post_ndjson_invalid_line(client, remove_ndjson, version):
+    """Test that an invalid NDJSON chunk returns 400 and stores nothing."""
+    response = client.post(f'/api/{version}/add/data', data=b'{"id": "item1"}\nnot json\n',
+                           content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.json['error'] == "Invalid JSON on line 2"
+    assert not os.path.exists(remove_ndjson)
+
+    response = client.post(f'/api/{version}/add/data', data=b'{"id": "item1"}\n{"id": 1}\n',
+                           content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.json['error'] == "Invalid record on line 2: id: expected string, got int"
+    assert not os.path.exists(remove_ndjson)
+
+
+# Test that a client exceeding its token bucket gets 429 with Retry-After
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_rate_limit(client, version):
+    """Test the per-client rate limit on the v2 API."""
+    client.application.config['RATE_LIMIT_BURST'] = 2
+    client.application.config['RATE_LIMIT_PER_SECOND'] = 0.01
+
+    assert client.post(f'/api/{version}/add/data', json={"key": "value"}).status_code == 200
+    assert client.post(f'/api/{version}/add/data', json={"key": "value"}).status_code == 200
+    response = client.post(f'/api/{version}/add/data', json={"key": "value"})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+    stats = client.get(f'/api/{version}/stats').json
+    assert stats['rate_limited'] == 1
+
+
+# Test that transfers beyond the concurrency cap are rejected and slots are released
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_concurrent_transfer_limit(client, version):
+    """Test the cap on concurrent transfers on the v2 API."""
+    from flask_server.v2.limits import get_admission_control
+    client.application.config['MAX_CONCURRENT_TRANSFERS'] = 1
+    client.application.config['TRANSFER_QUEUE_TIMEOUT'] = 0.01
+
+    with client.application.app_context():
+        control = get_admission_control()
+
+    response = client.post(f'/api/{version}/add/data', json={"key": "value"})
+    assert response.status_code == 200
+    response.close()
+    assert control.stats()['active_transfers'] == 0
+
+    # File downloads hold their slot until the response body is closed
+    response = client.get(f'/api/{version}/get/data')
+    assert response.status_code == 200
+    assert control.stats()['active_transfers'] == 1
+    response.close()
+    assert control.stats()['active_transfers'] == 0
+
+    assert control.acquire_transfer()
+    response = client.post(f'/api/{version}/add/data', json={"key": "value"})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+    control.release_transfer()
+
+    stats = client.get(f'/api/{version}/stats').json
+    assert stats['transfers_rejected'] == 1
+    assert stats['active_transfers'] == 0
+    assert stats['queued_transfers'] == 0
+
+
+# Test that request bodies above MAX_CONTENT_LENGTH are rejected
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_post_too_large(client, remove_ndjson, version):
+    """Test that a body larger than MAX_CONTENT_LENGTH returns 413."""
+    client.application.config['MAX_CONTENT_LENGTH'] = 16
+    response = client.post(f'/api/{version}/add/data', data=b'{"id": 1}\n' * 10,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 413
+
+
+# Test that uploads which do not match the feed schema are rejected
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_post_invalid_feed(client, tmp_path, version):
+    """Test that JSON bodies and files failing validation return 400 with the error position."""
+    response = client.post(f'/api/{version}/add/data', json={"items": [{"id": "item1"}, {"id": 2}]})
+    assert response.status_code == 400
+    assert response.json['error'] == "Invalid feed: items[1].id: expected string, got int"
+
+    response = client.post(f'/api/{version}/add/data', data=b'{"items": [{"id": "item1"},',
+                           content_type='application/json')
+    assert response.status_code == 400
+    assert response.json['error'].startswith("Invalid feed: Expecting value")
+
+    test_file = tmp_path / "invalid.json"
+    test_file.write_text('{"items": [{"author": "Author1"}]}')
+    with open(test_file, 'rb') as f:
+        response = client.post(f'/api/{version}/add/data', content_type='multipart/form-data',
+                               data={'file': (f, 'invalid.json')})
+    assert response.status_code == 400
+    assert response.json['error'] == "Invalid feed: items[0].id: missing required field"
+    assert not os.path.exists(os.path.join(client.application.config['UPLOAD_FOLDER'], 'invalid.json'))
+
+
+# Test the GET /api/v2/get/data/items endpoint serving a slice of the stored items
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_get_data_items_slice(client, version):
+    """Test that item slices are served from the stored JSON data."""
+    json_data = {"count": 5, "items": [{"id": f"item{i}"} for i in range(5)]}
+    assert client.post(f'/api/{version}/add/data', json=json_data).status_code == 200
+
+    response = client.get(f'/api/{version}/get/data/items?offset=3&limit=10')
+    assert response.status_code == 200
+    assert response.json == {"count": 5, "offset": 3, "items": [{"id": "item3"}, {"id": "item4"}]}
+
+    response = client.get(f'/api/{version}/get/data/items?offset=9')
+    assert response.json["items"] == []
+
+    response = client.get(f'/api/{version}/get/data/items?limit=0')
+    assert response.status_code == 400
+
+
+# Test that the stored file is served with validators and byte ranges
+@pytest.mark.parametrize("version", ["v2"])  # Set to v2 only now, as there are no other versions
+def test_get_data_conditional_and_range(client, version):
+    """Test ETag revalidation and Range requests on GET /api/v2/get/data."""
+    assert client.post(f'/api/{version}/add/data', json={"items": [{"id": "item1"}]}).status_code == 200
+
+    response = client.get(f'/api/{version}/get/data')
+    assert response.status_code == 200
+    assert response.content_length == len(response.data)
+    etag = response.headers['ETag']
+
+    response = client.get(f'/api/{version}/get/data', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = client.get(f'/api/{version}/get/data', headers={'Range': 'bytes=0-8'})
+    assert response.status_code == 206
+    assert response.data == b'{"items":'
@@ -0,0 +1,90 @@
+import os
+import pytest
+import requests_mock
+from flask_client.services import ResponseCache, get_json_data
+
+SERVER_URL = "http://localhost:5001/api/v2/get/data"
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+# Fixture to setup a moke HTTP request
+@pytest.fixture
+def requests_mock_fixture():
+    with requests_mock.Mocker() as m:
+        yield m
+
+
+# Test that a fresh cache entry is served without contacting the server
+def test_cache_hit(requests_mock_fixture, tmp_path):
+    """Test that a second fetch within the TTL is read from disk."""
+    requests_mock_fixture.get(SERVER_URL, json={"count": 0}, headers=dict(JSON_HEADERS, ETag='"v1"'))
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, ttl=300)
+
+    assert get_json_data(SERVER_URL, cache=cache) == {"count": 0}
+    assert get_json_data(SERVER_URL, cache=cache) == {"count": 0}
+
+    assert requests_mock_fixture.call_count == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.hits == 1
+
+
+# Test that an expired entry is revalidated with its ETag and Last-Modified
+def test_cache_revalidation(requests_mock_fixture, tmp_path):
+    """Test that a 304 answer serves the cached body."""
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+    requests_mock_fixture.get(SERVER_URL, [
+        {"json": {"count": 1}, "headers": dict(JSON_HEADERS, ETag='"v1"', **{"Last-Modified": last_modified})},
+        {"status_code": 304},
+    ])
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, ttl=0)
+
+    assert get_json_data(SERVER_URL, cache=cache) == {"count": 1}
+    assert get_json_data(SERVER_URL, cache=cache) == {"count": 1}
+
+    assert requests_mock_fixture.last_request.headers["If-None-Match"] == '"v1"'
+    assert requests_mock_fixture.last_request.headers["If-Modified-Since"] == last_modified
+    assert cache.stats.revalidated == 1
+
+
+# Test that a 304 only restarts the TTL of the entry, without rewriting it
+def test_cache_refresh_touches_mtime(requests_mock_fixture, tmp_path):
+    """Test that a revalidated entry is fresh again and keeps its contents."""
+    requests_mock_fixture.get(SERVER_URL, [
+        {"json": {"count": 1}, "headers": dict(JSON_HEADERS, ETag='"v1"')},
+        {"status_code": 304},
+    ])
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, ttl=300)
+
+    assert get_json_data(SERVER_URL, cache=cache) == {"count": 1}
+    path = cache._path(SERVER_URL)
+    os.utime(path, (0, 0))  # Expired
+    inode = os.stat(path).st_ino
+    assert get_json_data(SERVER_URL, cache=cache) == {"count": 1}
+    assert get_json_data(SERVER_URL, cache=cache) == {"count": 1}
+
+    assert os.stat(path).st_ino == inode
+    assert requests_mock_fixture.call_count == 2
+    assert cache.stats.revalidated == 1
+    assert cache.stats.hits == 1
+
+
+# Test that the least recently used entries are evicted above max_bytes
+def test_cache_lru_eviction(requests_mock_fixture, tmp_path):
+    """Test size-based LRU eviction."""
+    urls = [f"{SERVER_URL}?page={page}" for page in range(3)]
+    for url in urls:
+        requests_mock_fixture.get(url, json={"items": ["x" * 100]}, headers=JSON_HEADERS)
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, ttl=300)
+
+    get_json_data(urls[0], cache=cache)
+    cache.max_bytes = os.path.getsize(cache._path(urls[0])) * 5 // 2  # Room for two entries
+    get_json_data(urls[1], cache=cache)
+    for atime, url in enumerate(urls[:2]):
+        os.utime(cache._path(url), (atime, os.path.getmtime(cache._path(url))))
+    get_json_data(urls[0], cache=cache)  # Cache hit, marks urls[0] as recently used
+    get_json_data(urls[2], cache=cache)
+
+    assert cache.stats.evictions == 1
+    assert cache.lookup(urls[0]) is not None
+    assert cache.lookup(urls[1]) is None
+    assert cache.lookup(urls[2]) is not None
@@ -0,0 +1,127 @@
+import pytest
+import json
+import os
+import threading
+import flask_server.v2.storage as storage
+from flask_server.v2.storage import (StoredFeed, append_records, close_item_view, get_item_index, index_items,
+                                     open_item_view, replace_feed, save_atomically)
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../example.json')
+
+
+# Test that item offsets are found in example.json
+def test_index_items_example():
+    """Test index_items on the example feed."""
+    with open(EXAMPLE_FILE, 'rb') as f:
+        data = f.read()
+
+    offsets = index_items(data)
+    assert len(offsets) == 4
+    items = [json.loads(data[offsets[i]:offsets[i + 1]]) for i in range(0, len(offsets), 2)]
+    assert [item["seqUpdate"] for item in items] == [1617292803402, 16172928022293]
+
+
+# Test that brackets inside strings and nested "items" keys are ignored
+def test_index_items_tricky_strings():
+    """Test index_items with brackets in strings, escapes and nested arrays."""
+    data = (b'{"x": "items", "items": [{"a": "}{[\\"", "b": [1, {}]}, 3, {"c": {"items": [{}]}}],'
+            b' "z": [{}]}')
+    offsets = index_items(data)
+    assert [data[offsets[i]:offsets[i + 1]] for i in range(0, len(offsets), 2)] == [
+        b'{"a": "}{[\\"", "b": [1, {}]}',
+        b'{"c": {"items": [{}]}}',
+    ]
+
+
+# Test slicing a stored file through the memory-mapped view, and index invalidation
+def test_iter_slice(tmp_path):
+    """Test StoredFeed.iter_slice after the file is replaced."""
+    path = str(tmp_path / "data.json")
+    records_path = str(tmp_path / "data.ndjson")
+    save_atomically(path, lambda f: json.dump({"items": [{"id": str(i)} for i in range(5)]}, f), mode='w')
+
+    old_feed = StoredFeed(path, records_path)
+    document = json.loads(b''.join(old_feed.iter_slice(1, 3)))
+    assert document == {"count": 5, "offset": 1, "items": [{"id": "1"}, {"id": "2"}]}
+
+    save_atomically(path, lambda f: json.dump({"items": [{"id": "new"}]}, f), mode='w')
+    feed = StoredFeed(path, records_path)
+    assert json.loads(b''.join(feed.iter_slice(0, 1)))["items"] == [{"id": "new"}]
+    feed.close()
+
+    # A file opened before the replacement keeps being described by its own index
+    assert json.loads(b''.join(old_feed.iter_slice(4, 5)))["items"] == [{"id": "4"}]
+    old_feed.close()
+
+
+# Test that concurrent requests build the index of a file version only once
+def test_get_item_index_builds_once(tmp_path, monkeypatch):
+    """Test get_item_index from several threads at the same time."""
+    path = str(tmp_path / "data.json")
+    save_atomically(path, lambda f: json.dump({"items": [{"id": str(i)} for i in range(3)]}, f), mode='w')
+
+    builds = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_index_items(view):
+        builds.append(True)
+        started.set()
+        release.wait(5)
+        return index_items(view)
+    monkeypatch.setattr(storage, "index_items", slow_index_items)
+
+    results = []
+
+    def request():
+        f, view = open_item_view(path)
+        results.append(list(get_item_index(f, view)))
+        close_item_view(f, view)
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(builds) == 1
+    assert len(results) == 4 and all(result == results[0] for result in results)
+
+
+# Test serving the NDJSON store after the feed's items, with and without a stored feed
+def test_stored_feed_records(tmp_path):
+    """Test StoredFeed when there is no feed yet and when the feed has header fields after its items."""
+    feed_path = str(tmp_path / "data.json")
+    records_path = str(tmp_path / "data.ndjson")
+    with pytest.raises(FileNotFoundError):
+        StoredFeed(feed_path, records_path)
+
+    append_records(records_path, [b'{"id": "item1", "seqUpdate": 2}'])
+    feed = StoredFeed(feed_path, records_path)
+    assert json.loads(b''.join(feed.iter_document())) == {"items": [{"id": "item1", "seqUpdate": 2}], "count": 1,
+                                                          "seqUpdate": 2}
+    feed.close()
+
+    feed_data = b'{"count": 1, "items": [ {"id": "a"} ], "seqUpdate": 9, "x": []}'
+    replace_feed(feed_path, records_path, lambda f: f.write(feed_data))
+    assert not os.path.exists(records_path)
+    append_records(records_path, [b'{"id": "b", "seqUpdate": 3}', b'{"id": "c"}'])
+    feed = StoredFeed(feed_path, records_path)
+    assert json.loads(b''.join(feed.iter_document())) == {
+        "count": 3, "items": [{"id": "a"}, {"id": "b", "seqUpdate": 3}, {"id": "c"}], "seqUpdate": 9, "x": []}
+
+    # The snapshot ends where the store ended when it was opened, the index is extended for later readers
+    append_records(records_path, [b'{"id": "d", "seqUpdate": 11}'])
+    assert json.loads(b''.join(feed.iter_slice(1, 3))) == {
+        "count": 3, "offset": 1, "items": [{"id": "b", "seqUpdate": 3}, {"id": "c"}]}
+    later = StoredFeed(feed_path, records_path)
+    assert json.loads(b''.join(later.iter_slice(2, 4)))["items"] == [{"id": "c"}, {"id": "d", "seqUpdate": 11}]
+    assert later.seq_update == 11 and feed.seq_update == 3
+    later.close()
+    feed.close()
+
+    # The stored files are served as they are
+    with open(feed_path, 'rb') as f:
+        assert f.read() == feed_data